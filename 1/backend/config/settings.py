@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ REST_FRAMEWORK = {
 # Application definition
 
 INSTALLED_APPS = [
+    # daphne harus paling atas supaya runserver memakai ASGI (WebSocket)
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -64,6 +67,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Paling atas supaya latency mencakup semua middleware lain
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +83,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# Instrumentasi per request (latency, jumlah query, waktu DB) + endpoint /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -95,16 +103,85 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Channel layer untuk push live telemetry. InMemory hanya untuk satu proses
+# (dev/test); untuk beberapa worker ganti ke channels_redis.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Cache (ringkasan fleet, dsb). Default LocMem per proses; untuk beberapa worker
+# set CACHE_BACKEND/CACHE_LOCATION, mis. django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'iot-vending'),
+    }
+}
+# Detik; invalidation utama lewat signal, timeout hanya jaring pengaman
+FLEET_SUMMARY_CACHE_TIMEOUT = 300
+
+# Cache machine_id -> (pk, status) untuk ingest (lihat machines/lookup.py).
+# LRU lokal per proses di depan cache backend; TTL lokal pendek karena invalidation
+# lewat signal hanya sampai ke proses yang menyimpan
+MACHINE_LOOKUP_CACHE_SIZE = 4096
+MACHINE_LOOKUP_LOCAL_TIMEOUT = 30
+MACHINE_LOOKUP_CACHE_TIMEOUT = 3600
+# Pakai cache backend sebagai tier kedua? None = otomatis, hanya kalau backend-nya
+# dipakai bersama (bukan LocMem/Dummy)
+MACHINE_LOOKUP_SHARED_CACHE = None
+
+# Detik tanpa ingest sebelum machine 'online' dianggap 'offline' (manage.py sweep_machine_status)
+MACHINE_OFFLINE_AFTER = 300
+# Detik; machine yang menurut cache sudah online dicek ulang statusnya di database
+# paling sering sekali per interval ini (lihat machines/liveness.py)
+MACHINE_SEEN_CHECK_INTERVAL = 5
+
+# Mode ingest record_quality: 'sync' (commit per request) atau 'buffered'
+# (write-behind: balas 202, disimpan per batch oleh thread flusher; lihat machines/buffer.py)
+QUALITY_INGEST_MODE = os.environ.get('QUALITY_INGEST_MODE', 'sync')
+QUALITY_BUFFER = {
+    'BACKEND': 'machines.buffer.LocalIngestBuffer',
+    'FLUSH_INTERVAL_MS': 200,
+    'BATCH_SIZE': 500,
+    'MAX_ROWS': 50000,
+    # Flush yang gagal karena error database dicoba ulang; dibuang setelah sekian kali gagal
+    'MAX_ATTEMPTS': 5,
+}
+
+# Retention WaterQuality (manage.py archive_quality): reading mentah lebih tua dari
+# RAW_DAYS dipindah ke file arsip npz per machine per bulan di ARCHIVE_DIR
+QUALITY_RETENTION = {
+    'RAW_DAYS': int(os.environ.get('QUALITY_RAW_DAYS', 90)),
+    'ARCHIVE_DIR': os.environ.get('QUALITY_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'quality')),
+}
+
+# Deteksi anomali fleet (manage.py detect_quality_anomalies); default lihat machines/anomalies.py
+QUALITY_ANOMALY = {
+    'WINDOW_MINUTES': 60,
+    'ZSCORE_THRESHOLD': 4.0,
+    'FLATLINE_MINUTES': 30,
+}
+
+# Batas VendingMachine.deadband_max_gap (API & admin): lebih jarang dari ini, window
+# flatline berisi < 2 reading tersimpan dan stuck sensor tidak terdeteksi
+DEADBAND_MAX_GAP_LIMIT = QUALITY_ANOMALY['FLATLINE_MINUTES'] * 60 // 2
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DB_PROFILE: 'sqlite' (WAL + pragma, default), 'postgres', atau 'sqlite-default'
+# (SQLite tanpa tuning, untuk pembanding). Detail di core/db.py.
+from core.db import database_config  # noqa: E402
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(DB_PROFILE, BASE_DIR)
 }
 
 
@@ -18,8 +18,11 @@ from django.contrib import admin
 from django.urls import path
 from django.urls import path, include
 
+from core.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
      path('api/', include('machines.urls')),
        path('', include('machines.urls')),  # Ubah ini
 ]
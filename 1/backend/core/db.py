@@ -0,0 +1,88 @@
+"""
+Profil database yang bisa dipilih lewat DB_PROFILE ('sqlite' atau 'postgres').
+
+SQLite default-nya fsync di setiap commit dan mengunci seluruh file saat
+menulis; profil 'sqlite' menyalakan WAL (reader tidak diblok writer),
+synchronous=NORMAL, mmap dan busy timeout lewat signal connection_created.
+
+Di Postgres commit tetap durable secara default (SalesRecord = uang). Jalur
+ingest telemetry memanggil telemetry_commit() supaya hanya transaksi itu yang
+memakai synchronous_commit=off.
+"""
+import os
+
+from django.db import connections
+
+# PRAGMA yang dijalankan di setiap koneksi SQLite baru
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Aman dengan WAL: hanya transaksi terakhir yang bisa hilang saat listrik mati
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,  # negatif = KiB
+    'temp_store': 'MEMORY',
+}
+
+
+def database_config(profile, base_dir):
+    if profile == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'iot_vending'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Pakai ulang koneksi antar request; health check sebelum dipakai ulang
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'options': '-c statement_timeout=15000',
+            },
+        }
+    if profile == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': base_dir / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {
+                # Detik menunggu lock sebelum "database is locked"
+                'timeout': 5,
+            },
+        }
+    if profile == 'sqlite-default':
+        # Tanpa tuning, untuk pembanding di benchmark_db
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': base_dir / 'db.sqlite3',
+        }
+    raise ValueError(f"Unknown DB_PROFILE '{profile}'")
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Handler connection_created: jalankan SQLITE_PRAGMAS untuk profil 'sqlite'."""
+    from django.conf import settings
+
+    if connection.vendor != 'sqlite' or settings.DB_PROFILE != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def telemetry_commit(using='default'):
+    """
+    Panggil di dalam transaction.atomic() ingest reading: di Postgres commit transaksi
+    ini tidak menunggu flush WAL (synchronous_commit=off, setara synchronous=NORMAL di
+    SQLite; saat crash hanya reading terakhir yang bisa hilang). Transaksi lain,
+    mis. penjualan, tetap durable. SET LOCAL berlaku sampai transaksi terluar selesai,
+    jadi jangan dipanggil di transaksi yang juga mencatat penjualan. Di SQLite tidak
+    melakukan apa-apa.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL synchronous_commit = off')
@@ -0,0 +1,97 @@
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import DB_QUERIES, DB_TIME, REQUEST_LATENCY, REQUESTS
+
+
+class QueryStats:
+    """execute_wrapper: hitung jumlah & durasi query selama satu request."""
+
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+_DONE = object()
+
+
+@contextmanager
+def track_queries(stats):
+    """Pasang stats sebagai execute_wrapper di semua koneksi database."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield
+
+
+class MetricsMiddleware:
+    """
+    Catat latency, jumlah query dan waktu DB per view (url_name) untuk /metrics.
+    Matikan dengan METRICS_ENABLED = False; middleware lalu tidak dipasang sama sekali.
+
+    StreamingHttpResponse (export): query dijalankan saat body dibaca, setelah view
+    return. Query per chunk ikut dihitung dan metric baru dicatat saat stream
+    selesai/ditutup. Streaming async (async iterator) dicatat saat view return saja.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with track_queries(stats):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(
+                response.streaming_content, stats,
+                lambda: self.record(request, response, stats, time.perf_counter() - started)
+            )
+        else:
+            self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def stream(self, content, stats, finish):
+        # finally jalan saat iterasi habis atau saat response.close() (client putus)
+        try:
+            iterator = iter(content)
+            while True:
+                # Wrapper hanya aktif selama chunk dibuat, bukan saat generator menunggu
+                with track_queries(stats):
+                    chunk = next(iterator, _DONE)
+                if chunk is _DONE:
+                    return
+                yield chunk
+        finally:
+            finish()
+
+    def record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        if match is None:
+            view = 'unmatched'
+        else:
+            view = match.url_name or match.route
+        if view == 'metrics':
+            return
+        labels = (view, request.method)
+        REQUEST_LATENCY.observe(labels, elapsed)
+        REQUESTS.inc((view, request.method, f'{response.status_code // 100}xx'))
+        DB_QUERIES.observe(labels, stats.count)
+        DB_TIME.observe(labels, stats.duration)
@@ -1,3 +1,64 @@
+import unittest
+
+from django.conf import settings
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from machines.models import VendingMachine, WaterQuality
+
+from .db import database_config, telemetry_commit
+from .metrics import DB_QUERIES
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite' and settings.DB_PROFILE == 'sqlite', "Hanya profil sqlite")
+class SqliteProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+
+
+class PostgresProfileTests(TestCase):
+    def test_commits_durable_by_default(self):
+        config = database_config('postgres', settings.BASE_DIR)
+        self.assertNotIn('synchronous_commit', config['OPTIONS']['options'])
+
+    def test_telemetry_commit_is_noop_elsewhere(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest("Hanya untuk database selain Postgres")
+        with self.assertNumQueries(0):
+            telemetry_commit()
+
+
+class MetricsTests(TestCase):
+    def test_request_is_recorded(self):
+        self.client.get('/api/machines/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="vendingmachine-list",method="GET"}', body)
+        self.assertIn('db_queries_per_request_bucket{view="vendingmachine-list",method="GET",le="+Inf"}', body)
+        self.assertIn('http_requests_total{view="vendingmachine-list",method="GET",status="2xx"}', body)
+        self.assertNotIn('view="metrics"', body)
+
+    def test_streaming_queries_recorded_when_stream_closes(self):
+        machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        WaterQuality.objects.create(machine=machine, tds_level=100, ph_level=7, water_level=50)
+        labels = ('vendingmachine-export-quality', 'GET')
+
+        def recorded():
+            series = DB_QUERIES._series.get(labels)
+            return (series[0][-1] + sum(series[0][:-1]), series[1]) if series else (0, 0)
+
+        before_count, before_queries = recorded()
+        response = self.client.get('/api/machines/VM1/export_quality/')
+        # Query export baru jalan saat body dibaca; belum dicatat
+        self.assertEqual(recorded(), (before_count, before_queries))
+        b''.join(response.streaming_content)
+        response.close()
+        count, queries = recorded()
+        self.assertEqual(count, before_count + 1)
+        self.assertGreater(queries - before_queries, 1)
@@ -1,3 +1,11 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse
 
-# Create your views here.
+from .metrics import render_metrics
+
+
+def metrics(request):
+    """Metrics per proses dalam format teks Prometheus."""
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
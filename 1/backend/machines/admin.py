@@ -6,7 +6,7 @@ from .models import VendingMachine, WaterQuality, SalesRecord
 
 # Tambahkan di admin.py
 from django.contrib import admin
-from .models import VendingMachine, WaterQuality, SalesRecord
+from .models import VendingMachine, WaterQuality, SalesRecord, QualityRollup, MachineSnapshot, QualityAlert, SalesRollup
 
 class WaterQualityInline(admin.TabularInline):
     model = WaterQuality
@@ -20,4 +20,14 @@ class VendingMachineAdmin(admin.ModelAdmin):
 
 admin.site.register(VendingMachine, VendingMachineAdmin)
 admin.site.register(WaterQuality)
-admin.site.register(SalesRecord)
\ No newline at end of file
+admin.site.register(SalesRecord)
+admin.site.register(QualityRollup)
+admin.site.register(MachineSnapshot)
+admin.site.register(SalesRollup)
+
+
+class QualityAlertAdmin(admin.ModelAdmin):
+    list_display = ['machine', 'kind', 'metric', 'value', 'score', 'detected_at', 'resolved_at']
+    list_filter = ['kind', 'metric', 'resolved_at']
+
+admin.site.register(QualityAlert, QualityAlertAdmin)
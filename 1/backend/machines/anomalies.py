@@ -0,0 +1,214 @@
+"""
+Deteksi anomali water quality untuk seluruh fleet sekaligus.
+
+Semua reading dalam window (default 60 menit) diambil dengan satu query,
+diurutkan per machine, lalu dihitung per segmen (satu segmen = satu machine)
+dengan np.add.reduceat / np.maximum.reduceat. Tidak ada loop Python per
+machine, jadi ribuan machine tetap selesai dalam hitungan detik.
+
+- zscore: reading terakhir vs mean/std reading lain di window
+- drift: slope regresi linear (unit per jam) di window
+- flatline: nilai tidak berubah sama sekali selama FLATLINE_MINUTES
+
+Machine dengan deadband (deadband.py) hanya menyimpan reading yang berubah atau
+satu reading per deadband_max_gap detik; reading berulang di antaranya dihitung
+di snapshot, tidak disimpan. Untuk flatline, reading tersimpan yang datar
+mewakili reading yang ditahan sampai reading tersimpan berikutnya, jadi syarat
+FLATLINE_MIN_READINGS diganti syarat cakupan: tidak ada celah >= 2x max_gap
+dari awal window sampai sekarang. deadband_max_gap dibatasi
+DEADBAND_MAX_GAP_LIMIT (setengah window flatline) oleh validator model.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import QualityAlert, VendingMachine, WaterQuality
+
+METRICS = ['tds_level', 'ph_level', 'water_level']
+
+DEFAULTS = {
+    'WINDOW_MINUTES': 60,
+    # Minimal reading per machine di window supaya statistiknya berarti
+    'MIN_READINGS': 10,
+    'ZSCORE_THRESHOLD': 4.0,
+    # Perubahan per jam; None = tidak dicek (water level memang turun saat ada penjualan)
+    'DRIFT_PER_HOUR': {'tds_level': 50.0, 'ph_level': 0.5, 'water_level': None},
+    'FLATLINE_MINUTES': 30,
+    'FLATLINE_MIN_READINGS': 10,
+}
+
+Finding = namedtuple('Finding', 'machine_pk kind metric value score')
+
+
+class FleetWindow:
+    """
+    Reading seluruh fleet dalam satu array. `values` berbentuk (n, 3) dengan
+    kolom METRICS; baris satu machine berurutan (segmen) mulai starts[i].
+    """
+
+    def __init__(self, machine_pks, timestamps, values):
+        self.machine_pks = np.asarray(machine_pks, dtype=np.int64)
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1, len(METRICS))
+        if len(self.machine_pks):
+            boundaries = np.flatnonzero(np.diff(self.machine_pks)) + 1
+            self.starts = np.concatenate(([0], boundaries))
+        else:
+            self.starts = np.empty(0, dtype=np.int64)
+        self.counts = np.diff(np.append(self.starts, len(self.machine_pks)))
+        self.segment_pks = self.machine_pks[self.starts]
+
+    @classmethod
+    def load(cls, since):
+        rows = list(WaterQuality.objects.filter(timestamp__gte=since).order_by(
+            'machine_id', 'timestamp'
+        ).values_list('machine_id', 'timestamp', *METRICS))
+        if not rows:
+            return cls([], [], [])
+        machine_pks, timestamps, *columns = zip(*rows)
+        return cls(machine_pks, [ts.timestamp() for ts in timestamps], np.column_stack(columns))
+
+    def sums(self, array):
+        return np.add.reduceat(array, self.starts, axis=0)
+
+    def subset(self, mask):
+        return FleetWindow(self.machine_pks[mask], self.timestamps[mask], self.values[mask])
+
+
+def detect_zscore(window, config):
+    findings = []
+    enough = window.counts >= config['MIN_READINGS']
+    if not enough.any():
+        return findings
+    last = window.starts + window.counts - 1
+    latest = window.values[last]
+    # Baseline = semua reading di window kecuali yang terakhir
+    n = (window.counts - 1)[:, None]
+    total = window.sums(window.values) - latest
+    squares = window.sums(window.values ** 2) - latest ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        std = np.sqrt(np.maximum(squares / n - mean ** 2, 0))
+        z = (latest - mean) / std
+    # std 0 (nilai konstan) ditangani flatline, bukan di sini
+    hits = enough[:, None] & (std > 1e-9) & (np.abs(z) >= config['ZSCORE_THRESHOLD'])
+    for segment, column in zip(*np.nonzero(hits)):
+        findings.append(Finding(int(window.segment_pks[segment]), 'zscore', METRICS[column],
+                                float(latest[segment, column]), float(z[segment, column])))
+    return findings
+
+
+def detect_drift(window, config):
+    findings = []
+    enough = window.counts >= config['MIN_READINGS']
+    if not enough.any():
+        return findings
+    # Waktu relatif terhadap awal segmen (jam) supaya Σt² tidak kehilangan presisi
+    t = (window.timestamps - np.repeat(window.timestamps[window.starts], window.counts)) / 3600
+    n = window.counts[:, None].astype(np.float64)
+    sum_t = window.sums(t)[:, None]
+    sum_tt = window.sums(t * t)[:, None]
+    sum_y = window.sums(window.values)
+    sum_ty = window.sums(t[:, None] * window.values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sum_ty - sum_t * sum_y) / (n * sum_tt - sum_t ** 2)
+    latest = window.values[window.starts + window.counts - 1]
+    for column, metric in enumerate(METRICS):
+        threshold = config['DRIFT_PER_HOUR'].get(metric)
+        if threshold is None:
+            continue
+        hits = enough & np.isfinite(slope[:, column]) & (np.abs(slope[:, column]) >= threshold)
+        for segment in np.flatnonzero(hits):
+            findings.append(Finding(int(window.segment_pks[segment]), 'drift', metric,
+                                    float(latest[segment, column]), float(slope[segment, column])))
+    return findings
+
+
+def deadband_gaps():
+    """{machine pk: deadband_max_gap} untuk machine yang deadband-nya aktif."""
+    enabled = Q(deadband_tds__isnull=False) | Q(deadband_ph__isnull=False) | Q(deadband_water__isnull=False)
+    return dict(VendingMachine.objects.filter(enabled).values_list('pk', 'deadband_max_gap'))
+
+
+def detect_flatline(window, config, now, deadband=None):
+    """deadband: {machine pk: max_gap detik} (lihat deadband_gaps)."""
+    window_start = (now - timedelta(minutes=config['FLATLINE_MINUTES'])).timestamp()
+    recent = window.subset(window.timestamps >= window_start)
+    findings = []
+    if not len(recent.machine_pks):
+        return findings
+    spread = (np.maximum.reduceat(recent.values, recent.starts, axis=0)
+              - np.minimum.reduceat(recent.values, recent.starts, axis=0))
+    enough = recent.counts >= config['FLATLINE_MIN_READINGS']
+    if deadband:
+        limit = 2 * np.array([deadband.get(int(pk), 0) for pk in recent.segment_pks], dtype=np.float64)
+        last = recent.starts + recent.counts - 1
+        # Celah antar reading tersimpan; selisih antar segmen (machine berbeda) dinolkan
+        gaps = np.append(np.diff(recent.timestamps), 0)
+        gaps[last] = 0
+        covered = ((limit > 0) & (recent.counts >= 2)
+                   & (recent.timestamps[recent.starts] - window_start < limit)
+                   & (now.timestamp() - recent.timestamps[last] < limit)
+                   & (np.maximum.reduceat(gaps, recent.starts) < limit))
+        enough |= covered
+    hits = enough[:, None] & (spread == 0)
+    latest = recent.values[recent.starts + recent.counts - 1]
+    for segment, column in zip(*np.nonzero(hits)):
+        findings.append(Finding(int(recent.segment_pks[segment]), 'flatline', METRICS[column],
+                                float(latest[segment, column]), 0.0))
+    return findings
+
+
+def detect(window, config, now, deadband=None):
+    return (detect_zscore(window, config) + detect_drift(window, config)
+            + detect_flatline(window, config, now, deadband))
+
+
+def sync_alerts(findings, evaluated_pks, now):
+    """
+    Buat alert baru, perbarui alert terbuka yang masih terdeteksi, dan tutup
+    alert terbuka milik machine yang dievaluasi tapi sudah normal.
+    Return (created, resolved).
+    """
+    with transaction.atomic():
+        open_alerts = {
+            (alert.machine_id, alert.kind, alert.metric): alert
+            for alert in QualityAlert.objects.select_for_update().filter(resolved_at__isnull=True)
+        }
+        new, still_open = [], []
+        for finding in findings:
+            alert = open_alerts.pop((finding.machine_pk, finding.kind, finding.metric), None)
+            if alert is None:
+                new.append(QualityAlert(machine_id=finding.machine_pk, kind=finding.kind, metric=finding.metric,
+                                        value=finding.value, score=finding.score,
+                                        detected_at=now, last_detected_at=now))
+            else:
+                alert.value, alert.score, alert.last_detected_at = finding.value, finding.score, now
+                still_open.append(alert)
+        QualityAlert.objects.bulk_create(new)
+        QualityAlert.objects.bulk_update(still_open, ['value', 'score', 'last_detected_at'])
+        # Machine tanpa data di window tidak dievaluasi; alert-nya dibiarkan terbuka
+        resolved = [alert.pk for (machine_pk, _, _), alert in open_alerts.items() if machine_pk in evaluated_pks]
+        QualityAlert.objects.filter(pk__in=resolved).update(resolved_at=now)
+    return len(new), len(resolved)
+
+
+def run_detection(now=None, config=None):
+    """Satu putaran deteksi untuk seluruh fleet. Return dict statistik."""
+    config = {**DEFAULTS, **getattr(settings, 'QUALITY_ANOMALY', {}), **(config or {})}
+    now = now or timezone.now()
+    window = FleetWindow.load(now - timedelta(minutes=config['WINDOW_MINUTES']))
+    findings = detect(window, config, now, deadband_gaps())
+    created, resolved = sync_alerts(findings, set(window.segment_pks.tolist()), now)
+    return {
+        'machines': len(window.starts),
+        'readings': len(window.machine_pks),
+        'findings': len(findings),
+        'created': created,
+        'resolved': resolved,
+    }
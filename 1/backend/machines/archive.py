@@ -0,0 +1,189 @@
+"""
+Retention WaterQuality: reading mentah yang lebih tua dari RAW_DAYS dipindah ke
+file arsip per machine per bulan (UTC), lalu dihapus dari tabel.
+
+Format arsip: npz terkompresi, satu array per kolom (id, timestamp dalam epoch
+mikrodetik, tds_level, ph_level, water_level), urut (timestamp, id). Lokasi:
+<ARCHIVE_DIR>/<machine pk>/<YYYY-MM>.npz.
+
+QualityRollup tidak ikut dihapus, jadi semua resolution rollup tetap lengkap;
+quality_history raw (termasuk mode cursor/page_size) dan export_quality membaca
+arsip untuk bagian range yang sudah diarsipkan.
+"""
+import io
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WaterQuality
+
+COLUMNS = ['id', 'timestamp', 'tds_level', 'ph_level', 'water_level']
+
+# Baris per fetch saat membaca bulan yang akan diarsipkan
+ARCHIVE_CHUNK_SIZE = 20000
+# Primary key per DELETE (di bawah batas parameter SQLite)
+ARCHIVE_DELETE_CHUNK_SIZE = 500
+
+
+def retention_settings():
+    return {'RAW_DAYS': 90, 'ARCHIVE_DIR': settings.BASE_DIR / 'archive' / 'quality',
+            **getattr(settings, 'QUALITY_RETENTION', {})}
+
+
+def month_start(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start):
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def months_between(start, end):
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def archive_path(machine_pk, month):
+    return os.path.join(retention_settings()['ARCHIVE_DIR'], str(machine_pk), f'{month:%Y-%m}.npz')
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(timestamp):
+    # Aritmetika integer, bukan float .timestamp(), supaya mikrodetik tidak bergeser
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def load_archive(machine_pk, month):
+    """Isi satu file arsip sebagai dict kolom -> array, atau None kalau tidak ada."""
+    path = archive_path(machine_pk, month)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {column: data[column] for column in COLUMNS}
+
+
+def _write_archive(machine_pk, month, columns):
+    path = archive_path(machine_pk, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    # Tulis ke file sementara lalu rename, supaya file arsip tidak pernah setengah jadi
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+
+
+def _merge(existing, new):
+    """Gabung kolom arsip lama + baru; id dobel (run sebelumnya gagal sebelum delete) dibuang."""
+    if existing is None:
+        merged = new
+    else:
+        merged = {column: np.concatenate([existing[column], new[column]]) for column in COLUMNS}
+    _, unique = np.unique(merged['id'], return_index=True)
+    order = unique[np.lexsort((merged['id'][unique], merged['timestamp'][unique]))]
+    return {column: merged[column][order] for column in COLUMNS}
+
+
+def _read_month(qualities):
+    chunks = {column: [] for column in COLUMNS}
+    rows = qualities.values_list(*COLUMNS).iterator(chunk_size=ARCHIVE_CHUNK_SIZE)
+    while True:
+        batch = [row for _, row in zip(range(ARCHIVE_CHUNK_SIZE), rows)]
+        if not batch:
+            break
+        ids, timestamps, tds, ph, water = zip(*batch)
+        chunks['id'].append(np.array(ids, dtype=np.int64))
+        chunks['timestamp'].append(np.array([to_micros(ts) for ts in timestamps], dtype=np.int64))
+        chunks['tds_level'].append(np.array(tds, dtype=np.float64))
+        chunks['ph_level'].append(np.array(ph, dtype=np.float64))
+        chunks['water_level'].append(np.array(water, dtype=np.float64))
+    if not chunks['id']:
+        return None
+    return {column: np.concatenate(arrays) for column, arrays in chunks.items()}
+
+
+def archive_machine_month(machine_pk, month, cutoff):
+    """Arsipkan reading machine di bulan `month` yang lebih tua dari cutoff. Return jumlah baris."""
+    qualities = WaterQuality.objects.filter(
+        machine_id=machine_pk, timestamp__gte=month, timestamp__lt=min(next_month(month), cutoff)
+    ).order_by()
+    columns = _read_month(qualities)
+    if columns is None:
+        return 0
+    _write_archive(machine_pk, month, _merge(load_archive(machine_pk, month), columns))
+
+    # Hapus persis baris yang sudah masuk file. Insert telat di range yang sama (juga
+    # yang id-nya lebih kecil, mis. sequence Postgres yang commit belakangan)
+    # diarsipkan di run berikutnya. delete() publik juga meng-NULL-kan
+    # MachineSnapshot.last_quality yang menunjuk ke baris ini (on_delete SET_NULL)
+    archived_ids = columns['id'].tolist()
+    with transaction.atomic():
+        for i in range(0, len(archived_ids), ARCHIVE_DELETE_CHUNK_SIZE):
+            WaterQuality.objects.filter(pk__in=archived_ids[i:i + ARCHIVE_DELETE_CHUNK_SIZE]).delete()
+    return len(columns['id'])
+
+
+def archive_quality(now=None, raw_days=None):
+    """Pindahkan semua reading yang lebih tua dari raw_days (default RAW_DAYS) ke arsip."""
+    now = now or timezone.now()
+    raw_days = raw_days if raw_days is not None else retention_settings()['RAW_DAYS']
+    cutoff = now - timedelta(days=raw_days)
+
+    stats = {'machines': 0, 'files': 0, 'rows': 0}
+    old = WaterQuality.objects.filter(timestamp__lt=cutoff).order_by()
+    machine_pks = list(old.values_list('machine_id', flat=True).distinct())
+    for machine_pk in machine_pks:
+        oldest = old.filter(machine_id=machine_pk).order_by('timestamp').values_list('timestamp', flat=True).first()
+        stats['machines'] += 1
+        for month in months_between(oldest, cutoff):
+            rows = archive_machine_month(machine_pk, month, cutoff)
+            if rows:
+                stats['files'] += 1
+                stats['rows'] += rows
+    return stats
+
+
+def iter_archived(machine_pk, start, end, after=None):
+    """
+    Reading arsip machine dalam [start, end] sebagai (id, tds, ph, water, timestamp),
+    urut (timestamp, id). Hanya file bulan yang overlap dengan range yang dibuka, satu
+    per satu, jadi memory sebatas satu bulan. after: posisi keyset (timestamp, id);
+    hanya baris sesudahnya yang dikembalikan.
+    """
+    if after is not None:
+        start = max(start, after[0])
+    start_us, end_us = to_micros(start), to_micros(end)
+    for month in months_between(start, end):
+        columns = load_archive(machine_pk, month)
+        if columns is None:
+            continue
+        mask = (columns['timestamp'] >= start_us) & (columns['timestamp'] <= end_us)
+        if after is not None:
+            after_us = to_micros(after[0])
+            mask &= (columns['timestamp'] > after_us) | (columns['id'] > after[1])
+        yield from zip(
+            columns['id'][mask].tolist(),
+            columns['tds_level'][mask].tolist(),
+            columns['ph_level'][mask].tolist(),
+            columns['water_level'][mask].tolist(),
+            [from_micros(us) for us in columns['timestamp'][mask].tolist()],
+        )
+
+
+def read_archived(machine_pk, start, end, after=None):
+    """iter_archived sebagai list."""
+    return list(iter_archived(machine_pk, start, end, after))
@@ -0,0 +1,35 @@
+"""Helper statistik latency untuk command benchmark_db dan loadgen."""
+import math
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """latencies dalam detik -> dict ringkasan (ms, ops/s)."""
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        'ops': len(values),
+        'errors': errors,
+        'error_rate': errors / total if total else 0.0,
+        'throughput': len(values) / elapsed if elapsed else 0.0,
+        'p50': percentile(values, 50) * 1000,
+        'p95': percentile(values, 95) * 1000,
+        'p99': percentile(values, 99) * 1000,
+    }
+
+
+def format_row(name, stats):
+    return (
+        f"{name:<22} {stats['ops']:>8} {stats['throughput']:>9.1f}/s "
+        f"{stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['p99']:>8.1f} ms "
+        f"{stats['errors']:>6} err ({stats['error_rate']:.1%})"
+    )
+
+
+HEADER = f"{'operation':<22} {'ops':>8} {'throughput':>11} {'p50':>8} {'p95':>8} {'p99':>8}    {'errors':>6}"
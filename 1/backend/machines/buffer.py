@@ -0,0 +1,195 @@
+"""
+Write-behind buffer untuk record_quality (QUALITY_INGEST_MODE = 'buffered').
+
+Request hanya memvalidasi lalu memasukkan reading ke buffer dan membalas 202;
+thread flusher menyimpan isi buffer dengan bulk_create setiap FLUSH_INTERVAL_MS
+atau setiap BATCH_SIZE baris. Buffer dibatasi MAX_ROWS (request berikutnya
+dapat 503 sampai buffer longgar) dan dikosongkan saat proses berhenti.
+
+Kalau penyimpanan gagal karena error database (mis. "database is locked" atau
+statement_timeout), baris machine itu dikembalikan ke depan buffer dan dicoba
+lagi di flush berikutnya; baru dibuang (dan dihitung di `dropped`) setelah
+MAX_ATTEMPTS kali gagal atau kalau buffer sudah penuh.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'machines.buffer.LocalIngestBuffer',
+    'FLUSH_INTERVAL_MS': 200,
+    'BATCH_SIZE': 500,
+    'MAX_ROWS': 50000,
+    'MAX_ATTEMPTS': 5,
+}
+
+
+class BufferFull(Exception):
+    pass
+
+
+class LocalIngestBuffer:
+    """
+    Antrian in-process (deque + lock). Interface-nya (push / pop_batch / requeue /
+    __len__) sengaja sederhana supaya bisa diganti backend lain, mis. list Redis
+    (RPUSH / LPOP count / LPUSH), lewat QUALITY_BUFFER['BACKEND'].
+    """
+
+    def __init__(self, max_rows):
+        self.max_rows = max_rows
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def push(self, item):
+        with self._lock:
+            if len(self._items) >= self.max_rows:
+                raise BufferFull()
+            self._items.append(item)
+            return len(self._items)
+
+    def pop_batch(self, size):
+        with self._lock:
+            count = min(size, len(self._items))
+            return [self._items.popleft() for _ in range(count)]
+
+    def requeue(self, items):
+        """Kembalikan items ke depan antrian, sebanyak yang muat. Return jumlah yang dibuang."""
+        with self._lock:
+            room = max(0, self.max_rows - len(self._items))
+            self._items.extendleft(reversed(items[:room]))
+            return len(items) - min(room, len(items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class QualityIngestBuffer:
+    def __init__(self, config=None):
+        config = {**DEFAULTS, **(config or {})}
+        self.flush_interval = config['FLUSH_INTERVAL_MS'] / 1000
+        self.batch_size = config['BATCH_SIZE']
+        self.max_attempts = config['MAX_ATTEMPTS']
+        # Jumlah reading yang dibuang karena terus gagal disimpan
+        self.dropped = 0
+        self.backend = import_string(config['BACKEND'])(config['MAX_ROWS'])
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, machine_pk, row):
+        """Masukkan satu reading (validated_data). BufferFull kalau buffer penuh."""
+        size = self.backend.push((machine_pk, row, 0))
+        self._ensure_started()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Simpan semua isi buffer sekarang. Return jumlah baris yang selesai diproses
+        (tersimpan, duplikat, atau dibuang); baris yang gagal karena error database
+        dikembalikan ke buffer dan flush berhenti sampai giliran berikutnya.
+        """
+        from .models import VendingMachine
+
+        processed = 0
+        with self._flush_lock:
+            while True:
+                items = self.backend.pop_batch(self.batch_size)
+                if not items:
+                    return processed
+                by_machine = defaultdict(list)
+                for item in items:
+                    by_machine[item[0]].append(item)
+                try:
+                    machines = VendingMachine.objects.in_bulk(list(by_machine))
+                except DatabaseError:
+                    logger.exception("Loading machines for %d buffered readings failed", len(items))
+                    return processed + self._retry_later(items)
+                failed = []
+                for machine_pk, machine_items in by_machine.items():
+                    machine = machines.get(machine_pk)
+                    if machine is None:
+                        # Machine dihapus setelah reading masuk buffer
+                        processed += len(machine_items)
+                        continue
+                    try:
+                        self._save(machine, [row for _, row, _ in machine_items])
+                        processed += len(machine_items)
+                    except DatabaseError:
+                        logger.exception("Saving %d buffered readings for machine %s failed",
+                                         len(machine_items), machine.machine_id)
+                        failed.extend(machine_items)
+                if failed:
+                    return processed + self._retry_later(failed)
+
+    @staticmethod
+    def _save(machine, rows):
+        from .ingest import save_readings
+
+        try:
+            save_readings(machine, rows)
+        except IntegrityError:
+            # client_id yang sama masuk bersamaan lewat jalur lain; percobaan kedua
+            # akan melewati baris yang sudah tersimpan
+            save_readings(machine, rows)
+
+    def _retry_later(self, items):
+        """Kembalikan items yang gagal ke buffer. Return jumlah yang dibuang."""
+        retry = [(machine_pk, row, attempts + 1) for machine_pk, row, attempts in items
+                 if attempts + 1 < self.max_attempts]
+        dropped = len(items) - len(retry) + self.backend.requeue(retry)
+        if dropped:
+            self.dropped += dropped
+            logger.error("Dropping %d buffered readings after repeated failures", dropped)
+        return dropped
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("Flushing quality ingest buffer failed")
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='quality-ingest-flusher', daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """Hentikan flusher dan simpan sisa buffer (dipanggil otomatis saat exit)."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_quality_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = QualityIngestBuffer(getattr(settings, 'QUALITY_BUFFER', None))
+    return _buffer
@@ -0,0 +1,34 @@
+"""
+Conditional GET (ETag / Last-Modified) untuk API machine.
+
+Validator dihitung dari timestamp murah (VendingMachine.updated_at dan
+MachineSnapshot.updated_at, yang berubah di setiap ingest), jadi 304 bisa
+dikirim tanpa query ke tabel besar dan tanpa serialize.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """Response 304 kalau If-None-Match/If-Modified-Since cocok, selain itu None."""
+    timestamp = last_modified.timestamp() if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Boleh disimpan client, tapi selalu divalidasi ulang (tidak ada data basi)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
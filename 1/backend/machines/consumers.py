@@ -0,0 +1,35 @@
+from asgiref.sync import async_to_sync
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+
+
+def quality_group(machine_id):
+    return f'machine_{machine_id}_quality'
+
+
+def broadcast_readings(machine_id, readings):
+    """Kirim readings (sudah di-serialize) ke semua dashboard yang subscribe."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        quality_group(machine_id), {'type': 'quality.readings', 'readings': readings}
+    )
+
+
+class QualityConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Push setiap WaterQuality baru ke dashboard yang subscribe ke satu machine.
+    URL: ws/machines/<machine_id>/quality/
+    """
+
+    async def connect(self):
+        self.group_name = quality_group(self.scope['url_route']['kwargs']['machine_id'])
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def quality_readings(self, event):
+        await self.send_json({'readings': event['readings']})
@@ -0,0 +1,69 @@
+"""
+Deadband ingest: reading yang (hampir) sama dengan reading tersimpan terakhir
+tidak disimpan, hanya dihitung di MachineSnapshot.suppressed_count/_total.
+
+Reading disimpan kalau salah satu nilai berubah melebihi toleransinya
+(VendingMachine.deadband_*; kosong = toleransi 0 selama deadband aktif), atau
+kalau sudah deadband_max_gap detik sejak reading tersimpan terakhir, supaya
+chart dan rollup tetap punya titik secara berkala. Reading yang lebih tua dari
+reading tersimpan terakhir (replay batch) selalu disimpan.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from . import liveness
+from .snapshots import locked_snapshot
+
+FIELDS = [('tds_level', 'deadband_tds', 'last_tds_level'),
+          ('ph_level', 'deadband_ph', 'last_ph_level'),
+          ('water_level', 'deadband_water', 'last_water_level')]
+
+
+def deadband_enabled(machine):
+    return any(getattr(machine, tolerance) is not None for _, tolerance, _ in FIELDS)
+
+
+def filter_readings(machine, rows, now=None):
+    """
+    rows: validated_data reading (timestamp opsional = sekarang). Return (disimpan, jumlah suppressed).
+    Harus di dalam transaksi; snapshot machine dikunci kalau deadband aktif.
+    """
+    if not deadband_enabled(machine) or not rows:
+        return rows, 0
+    now = now or timezone.now()
+    snapshot = locked_snapshot(machine)
+    if snapshot.last_quality_at is None:
+        return rows, 0
+
+    tolerances = [getattr(machine, tolerance) or 0 for _, tolerance, _ in FIELDS]
+    max_gap = timedelta(seconds=machine.deadband_max_gap)
+    last_values = [getattr(snapshot, last) for _, _, last in FIELDS]
+    last_at = snapshot.last_quality_at
+
+    kept = []
+    suppressed = 0
+    for row in sorted(rows, key=lambda row: row.get('timestamp') or now):
+        timestamp = row.get('timestamp') or now
+        values = [row[field] for field, _, _ in FIELDS]
+        changed = any(abs(value - last) > tolerance
+                      for value, last, tolerance in zip(values, last_values, tolerances))
+        if timestamp < last_at:
+            kept.append(row)
+        elif changed or timestamp - last_at >= max_gap:
+            kept.append(row)
+            last_values, last_at = values, timestamp
+        else:
+            suppressed += 1
+    return kept, suppressed
+
+
+def readings_suppressed(machine, count, now=None):
+    """Catat reading yang tidak disimpan; tetap dihitung sebagai heartbeat (last_seen)."""
+    snapshot = locked_snapshot(machine)
+    snapshot.suppressed_count += count
+    snapshot.suppressed_total += count
+    snapshot.last_seen = now or timezone.now()
+    snapshot.save()
+    liveness.machine_seen(machine)
+    return snapshot
@@ -0,0 +1,65 @@
+"""
+Downsampling time series untuk chart (Largest-Triangle-Three-Buckets).
+
+LTTB mempertahankan bentuk kurva, termasuk spike pH/TDS, jauh lebih baik
+daripada mengambil setiap baris ke-n.
+"""
+import numpy as np
+
+# LTTB butuh minimal 3 titik (pertama, satu bucket, terakhir) per series
+MIN_POINTS_PER_SERIES = 3
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Index titik yang dipilih LTTB dari (x, y); x harus urut naik.
+    Titik pertama dan terakhir selalu ikut.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Batas bucket untuk titik 1..n-2 (titik pertama & terakhir berdiri sendiri)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Rata-rata tiap bucket dihitung sekaligus dengan cumsum
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = edges[1:] - edges[:-1]
+    avg_x = (cx[edges[1:]] - cx[edges[:-1]]) / counts
+    avg_y = (cy[edges[1:]] - cy[edges[:-1]]) / counts
+    # Bucket "berikutnya" untuk bucket terakhir adalah titik terakhir
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    # Loop per bucket (bukan per titik); luas segitiga dalam bucket di-vektorisasi
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs(
+            (x[prev] - next_x[i]) * (by - y[prev])
+            - (x[prev] - bx) * (next_y[i] - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def downsample_indices(x, series, max_points):
+    """
+    Gabungan index LTTB untuk beberapa series yang berbagi sumbu x.
+    Budget dibagi rata antar series supaya hasil gabungan <= max_points;
+    ValueError kalau max_points < MIN_POINTS_PER_SERIES * jumlah series.
+    """
+    if max_points < MIN_POINTS_PER_SERIES * len(series):
+        raise ValueError(f"max_points must be >= {MIN_POINTS_PER_SERIES * len(series)}")
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    per_series = max_points // len(series)
+    indices = [lttb_indices(x, np.asarray(y, dtype=np.float64), per_series) for y in series]
+    return np.unique(np.concatenate(indices))
@@ -0,0 +1,108 @@
+"""
+Export streaming WaterQuality/SalesRecord (NDJSON atau CSV, opsional gzip).
+Baris dibaca dengan .iterator() dan ditulis per chunk, jadi memory tetap datar
+berapa pun panjang range-nya.
+"""
+import csv
+import heapq
+import io
+import json
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+# Jumlah baris per fetch dari database
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = {
+    'quality': ['id', 'tds_level', 'ph_level', 'water_level', 'timestamp'],
+    'sales': ['id', 'volume', 'price', 'timestamp'],
+}
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _plain(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    # Decimal (price) dikirim sebagai string supaya tidak kehilangan presisi
+    return str(value)
+
+
+def _ndjson_lines(fields, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, map(_plain, row)))) + '\n'
+
+
+def _csv_lines(fields, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_plain(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header tetap dikirim walaupun tidak ada baris
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _encoded(lines, batch_bytes=64 * 1024):
+    """Gabungkan baris kecil jadi chunk ~64KB supaya tidak ada write per baris."""
+    batch = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        batch.append(data)
+        size += len(data)
+        if size >= batch_bytes:
+            yield b''.join(batch)
+            batch = []
+            size = 0
+    if batch:
+        yield b''.join(batch)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = format gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(queryset, kind, output='ndjson', gzip=False, filename='export', archived=None):
+    """
+    queryset: WaterQuality/SalesRecord yang sudah difilter & diurutkan (timestamp, id).
+    kind: 'quality' atau 'sales'. output: 'ndjson' atau 'csv'.
+    archived: opsional, iterable baris tambahan dengan urutan kolom EXPORT_FIELDS[kind]
+    dan urutan (timestamp, id) yang sama (mis. archive.iter_archived); digabung lazy.
+    """
+    fields = EXPORT_FIELDS[kind]
+    rows = queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if archived is not None:
+        # timestamp kolom terakhir, id kolom pertama
+        rows = heapq.merge(archived, rows, key=lambda row: (row[-1], row[0]))
+    lines = _csv_lines(fields, rows) if output == 'csv' else _ndjson_lines(fields, rows)
+    chunks = _encoded(lines)
+    if gzip:
+        chunks = _gzipped(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[output])
+    extension = 'csv' if output == 'csv' else 'ndjson'
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    # gzip bisa dipilih dari Accept-Encoding, jadi cache bersama harus membedakannya
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    # Jangan di-buffer oleh reverse proxy (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
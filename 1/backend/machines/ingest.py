@@ -0,0 +1,72 @@
+"""
+Hook setelah data ingest disimpan. Semua fungsi di sini dipanggil di dalam
+transaksi yang sama dengan insert-nya, supaya tabel turunan selalu konsisten.
+"""
+from django.db import transaction
+
+from core.db import telemetry_commit
+
+from . import deadband, liveness, snapshots
+from .consumers import broadcast_readings
+from .models import WaterQuality
+from .rollups import update_quality_rollups
+from .sales_rollups import update_sales_rollups
+from .serializers import WaterQualitySerializer
+
+
+def quality_ingested(machine, qualities):
+    """qualities: list WaterQuality yang baru disimpan untuk machine."""
+    if not qualities:
+        return
+    update_quality_rollups(machine, qualities)
+    snapshots.apply_qualities(machine, qualities)
+    liveness.machine_seen(machine)
+
+    # Push ke dashboard hanya setelah commit, supaya tidak mengirim data yang di-rollback
+    readings = list(WaterQualitySerializer(
+        sorted(qualities, key=lambda quality: quality.timestamp), many=True
+    ).data)
+    transaction.on_commit(lambda: broadcast_readings(machine.machine_id, readings))
+
+
+def save_readings(machine, rows):
+    """
+    Simpan banyak reading (validated_data) untuk satu machine dengan satu bulk_create.
+    Baris dengan client_id yang sudah tersimpan (atau kembar di rows) dilewati, baris
+    yang tertahan deadband machine hanya dihitung. Return (created, duplicates, suppressed).
+    IntegrityError kalau batch yang sama disimpan bersamaan.
+    """
+    client_ids = [row['client_id'] for row in rows if row.get('client_id')]
+    seen = set()
+    if client_ids:
+        seen = set(machine.water_qualities.filter(
+            client_id__in=client_ids
+        ).values_list('client_id', flat=True))
+    new_rows = []
+    for row in rows:
+        client_id = row.get('client_id')
+        if client_id:
+            if client_id in seen:
+                continue
+            seen.add(client_id)
+        new_rows.append(row)
+
+    duplicates = len(rows) - len(new_rows)
+
+    with transaction.atomic():
+        telemetry_commit()
+        new_rows, suppressed = deadband.filter_readings(machine, new_rows)
+        qualities = WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, **row)
+            for row in new_rows
+        ])
+        quality_ingested(machine, qualities)
+        if suppressed:
+            deadband.readings_suppressed(machine, suppressed)
+    return len(new_rows), duplicates, suppressed
+
+
+def sale_recorded(machine, sale):
+    update_sales_rollups(machine, [sale])
+    snapshots.apply_sale(machine, sale)
+    liveness.machine_seen(machine)
@@ -0,0 +1,66 @@
+"""
+Status online/offline dari heartbeat ingest.
+
+Setiap ingest (quality atau sale) membuat machine 'offline' jadi 'online'. Status
+di cache lookup bisa basi (sweep jalan di proses lain dan hanya menghapus cache
+prosesnya sendiri), jadi keputusan diambil dari database: UPDATE bersyarat
+status='offline', paling sering sekali per MACHINE_SEEN_CHECK_INTERVAL detik per
+machine kalau cache bilang machine sudah online. sweep_offline() (dijadwalkan lewat manage.py sweep_machine_status)
+mengubah machine 'online' yang tidak mengirim apa pun selama MACHINE_OFFLINE_AFTER
+detik jadi 'offline', lewat index MachineSnapshot.last_seen.
+
+Status 'maintenance' dan 'error' tetap manual dan tidak disentuh.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .lookup import LRUCache, forget_machine
+from .models import VendingMachine
+from .summary import invalidate_fleet_summary
+
+# pk machine yang statusnya baru saja dicek di database
+_checked = LRUCache(settings.MACHINE_LOOKUP_CACHE_SIZE, settings.MACHINE_SEEN_CHECK_INTERVAL)
+
+
+def _status_changed(machine_ids):
+    # update() tidak mengirim signal, jadi cache diinvalidate manual setelah commit
+    def invalidate():
+        invalidate_fleet_summary()
+        forget_machine(*machine_ids)
+    transaction.on_commit(invalidate)
+
+
+def machine_seen(machine, now=None):
+    """Dipanggil dari hook ingest. Return True kalau status berubah jadi online."""
+    if machine.status != 'offline' and _checked.get(machine.pk):
+        return False
+    _checked.set(machine.pk, True)
+    now = now or timezone.now()
+    changed = VendingMachine.objects.filter(pk=machine.pk, status='offline').update(
+        status='online', updated_at=now
+    )
+    if changed:
+        machine.status = machine._loaded_status = 'online'
+        _status_changed([machine.machine_id])
+    return bool(changed)
+
+
+def sweep_offline(now=None):
+    """Ubah machine online tanpa heartbeat jadi offline. Return jumlah machine."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.MACHINE_OFFLINE_AFTER)
+    stale = VendingMachine.objects.filter(status='online').filter(
+        Q(snapshot__last_seen__lt=cutoff) | Q(snapshot__last_seen__isnull=True)
+    )
+    with transaction.atomic():
+        machine_ids = list(stale.values_list('machine_id', flat=True))
+        if not machine_ids:
+            return 0
+        # Kondisi diulang di UPDATE supaya machine yang baru saja mengirim data tidak ikut
+        count = stale.update(status='offline', updated_at=now)
+        _status_changed(machine_ids)
+    return count
@@ -0,0 +1,116 @@
+"""
+Cache machine_id -> (pk, status, konfigurasi deadband) untuk jalur ingest.
+
+Urutan lookup: LRU lokal per proses -> cache backend (CACHES['default'], hanya
+kalau backend-nya dipakai bersama antar worker, mis. Redis) -> database. Signal
+di signals.py menghapus entry saat machine disimpan/dihapus. Entry LRU lokal
+punya TTL pendek karena signal dari proses lain tidak bisa menghapusnya; cache
+LocMem juga per proses, jadi tier kedua dilewati supaya TTL pendek itu berlaku.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from .models import VendingMachine
+
+# v2: nilai berisi konfigurasi deadband
+LOOKUP_KEY = 'machines:lookup:v2:{}'
+
+# Backend cache yang isinya hanya terlihat di proses sendiri
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Field yang di-cache (selain machine_id); sisanya DEFERRED di instance hasil resolve_machine
+LOOKUP_FIELDS = ['id', 'status', 'deadband_tds', 'deadband_ph', 'deadband_water', 'deadband_max_gap']
+
+
+class LRUCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_local = LRUCache(settings.MACHINE_LOOKUP_CACHE_SIZE, settings.MACHINE_LOOKUP_LOCAL_TIMEOUT)
+
+
+def _shared_cache():
+    shared = settings.MACHINE_LOOKUP_SHARED_CACHE
+    if shared is None:
+        shared = settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+    return shared
+
+
+def _lookup(machine_id):
+    """Nilai LOOKUP_FIELDS untuk machine_id. VendingMachine.DoesNotExist kalau tidak ada."""
+    value = _local.get(machine_id)
+    if value is None:
+        shared = _shared_cache()
+        value = cache.get(LOOKUP_KEY.format(machine_id)) if shared else None
+        if value is None:
+            value = VendingMachine.objects.filter(
+                machine_id=machine_id
+            ).values_list(*LOOKUP_FIELDS).first()
+            if value is None:
+                # Machine yang tidak ada tidak di-cache, supaya registrasi baru langsung terlihat
+                raise VendingMachine.DoesNotExist(f"No machine with machine_id {machine_id!r}")
+            if shared:
+                cache.set(LOOKUP_KEY.format(machine_id), value, settings.MACHINE_LOOKUP_CACHE_TIMEOUT)
+        _local.set(machine_id, tuple(value))
+    return value
+
+
+def resolve_machine(machine_id):
+    """
+    VendingMachine untuk ingest tanpa query (kalau sudah di-cache). Hanya
+    machine_id dan LOOKUP_FIELDS yang terisi; field lain deferred, jadi save()
+    pada instance ini hanya menulis field yang terisi.
+    """
+    loaded = dict(zip(LOOKUP_FIELDS, _lookup(machine_id)), machine_id=machine_id)
+    # from_db butuh nilai dalam urutan concrete field model
+    names = [field.attname for field in VendingMachine._meta.concrete_fields if field.attname in loaded]
+    return VendingMachine.from_db(router.db_for_read(VendingMachine), names, [loaded[name] for name in names])
+
+
+def forget_machine(*machine_ids):
+    for machine_id in machine_ids:
+        _local.delete(machine_id)
+    cache.delete_many([LOOKUP_KEY.format(machine_id) for machine_id in machine_ids])
+
+
+def clear_local_cache():
+    _local.clear()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from machines.archive import archive_quality, retention_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Pindahkan WaterQuality yang lebih tua dari QUALITY_RETENTION['RAW_DAYS'] ke file arsip "
+        "npz per machine per bulan, lalu hapus dari tabel. Aman dijalankan ulang (mis. cron harian)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Override RAW_DAYS")
+
+    def handle(self, *args, **options):
+        stats = archive_quality(raw_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rows']} readings from {stats['machines']} machines archived "
+            f"into {stats['files']} files under {retention_settings()['ARCHIVE_DIR']}"
+        ))
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from machines.benchmarking import HEADER, format_row, summarize
+from machines.ingest import quality_ingested
+from machines.models import VendingMachine, WaterQuality
+
+BENCH_PREFIX = 'BENCH-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Ukur ingest bersamaan + baca dashboard langsung ke database dengan profil aktif. "
+        "Jalankan per profil, mis. DB_PROFILE=sqlite-default / sqlite / postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Thread ingest record_quality")
+        parser.add_argument('--readers', type=int, default=4, help="Thread baca dashboard")
+        parser.add_argument('--duration', type=float, default=10, help="Lama benchmark (detik)")
+        parser.add_argument('--machines', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=2000, help="Reading awal per machine")
+        parser.add_argument('--keep', action='store_true', help="Jangan hapus data benchmark")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"DB_PROFILE={settings.DB_PROFILE} ({connection.vendor})")
+        machines = self.setup_machines(options['machines'], options['seed'])
+        results = {}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def record(name, latency=None):
+            with lock:
+                latencies, errors = results.setdefault(name, ([], [0]))
+                if latency is None:
+                    errors[0] += 1
+                else:
+                    latencies.append(latency)
+
+        def timed(name, func):
+            started = time.perf_counter()
+            try:
+                func()
+            except DatabaseError:
+                record(name)
+            else:
+                record(name, time.perf_counter() - started)
+
+        def writer():
+            try:
+                while time.perf_counter() < deadline:
+                    machine = random.choice(machines)
+                    timed('record_quality', lambda: self.ingest(machine))
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while time.perf_counter() < deadline:
+                    machine = random.choice(machines)
+                    timed('machine_list', lambda: list(
+                        VendingMachine.objects.with_dashboard_stats().order_by('id')[:50]
+                    ))
+                    timed('quality_history_24h', lambda: list(
+                        machine.water_qualities.filter(
+                            timestamp__gte=timezone.now() - timedelta(hours=24)
+                        ).order_by('timestamp')
+                    ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(HEADER)
+        for name, (latencies, errors) in sorted(results.items()):
+            self.stdout.write(format_row(name, summarize(latencies, errors[0], elapsed)))
+
+        if not options['keep']:
+            VendingMachine.objects.filter(machine_id__startswith=BENCH_PREFIX).delete()
+
+    def ingest(self, machine):
+        with transaction.atomic():
+            quality = WaterQuality.objects.create(
+                machine=machine, tds_level=random.uniform(50, 300),
+                ph_level=random.uniform(6, 8.5), water_level=random.uniform(0, 100)
+            )
+            quality_ingested(machine, [quality])
+
+    def setup_machines(self, count, seed):
+        VendingMachine.objects.filter(machine_id__startswith=BENCH_PREFIX).delete()
+        machines = VendingMachine.objects.bulk_create([
+            VendingMachine(machine_id=f'{BENCH_PREFIX}{i:04d}', name=f'Bench {i}', location='Benchmark')
+            for i in range(count)
+        ])
+        now = timezone.now()
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=100, ph_level=7, water_level=50,
+                         timestamp=now - timedelta(seconds=30 * n))
+            for machine in machines
+            for n in range(seed)
+        ], batch_size=5000)
+        return machines
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from machines.anomalies import run_detection
+
+
+class Command(BaseCommand):
+    help = (
+        "Deteksi anomali water quality (z-score, drift, flat-line) untuk seluruh fleet "
+        "dan simpan ke QualityAlert. Jalankan dari cron tiap menit, atau dengan --every "
+        "supaya command ini sendiri yang menjadwalkan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help="Ulangi setiap N detik sampai dihentikan (0 = sekali jalan)")
+        parser.add_argument('--window', type=int, help="Window dalam menit (default QUALITY_ANOMALY)")
+
+    def handle(self, *args, **options):
+        config = {'WINDOW_MINUTES': options['window']} if options['window'] else None
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            stats = run_detection(config=config)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{stats['machines']} machines, {stats['readings']} readings: "
+                f"{stats['findings']} findings, {stats['created']} new, {stats['resolved']} resolved "
+                f"({elapsed:.2f}s)"
+            )
+            if not options['every']:
+                return
+            time.sleep(max(0, options['every'] - elapsed))
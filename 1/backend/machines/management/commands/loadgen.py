@@ -0,0 +1,171 @@
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from machines.benchmarking import HEADER, format_row, summarize
+
+LOADGEN_PREFIX = 'LOAD-'
+
+
+class Kiosk:
+    """Satu kiosk virtual dengan koneksi HTTP keep-alive sendiri."""
+
+    def __init__(self, base_url, machine_id, record):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.machine_id = machine_id
+        self.record = record
+        self.conn = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = cls(self.host, self.port, timeout=30)
+
+    def request(self, name, method, path, payload=None):
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self._connect()
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            ok = False
+        self.record(name, time.perf_counter() - started if ok else None)
+        return ok
+
+    def record_quality(self):
+        return self.request('record_quality', 'POST', f'/api/machines/{self.machine_id}/record_quality/', {
+            'tds_level': round(random.uniform(50, 300), 1),
+            'ph_level': round(random.uniform(6, 8.5), 2),
+            'water_level': round(random.uniform(0, 100), 1),
+            'client_id': str(uuid.uuid4()),
+        })
+
+    def record_sale(self):
+        volume = random.choice([100, 300, 600])
+        return self.request('record_sale', 'POST', f'/api/machines/{self.machine_id}/record_sale/', {
+            'volume': volume, 'price': f'{volume * 10}.00', 'client_id': str(uuid.uuid4()),
+        })
+
+    def view_dashboard(self):
+        # Sama seperti machine_detail.html saat memuat chart 24 jam
+        end = datetime.now(dt_timezone.utc)
+        query = urlencode({
+            'start_date': (end - timedelta(hours=24)).isoformat(),
+            'end_date': end.isoformat(),
+            'resolution': 'auto',
+            'max_points': 800,
+        })
+        self.request('quality_history', 'GET', f'/api/machines/{self.machine_id}/quality-history/?{query}')
+        self.request('machine_list', 'GET', '/api/machines/')
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulasikan N kiosk virtual terhadap server yang sedang jalan (mis. runserver): "
+        "record_quality, record_sale dan baca dashboard dengan interval tertentu, lalu "
+        "laporkan throughput, p50/p95/p99 dan error rate per endpoint. Machine "
+        f"{LOADGEN_PREFIX}xxxx dibuat lewat API dan tetap ada setelah run (ikut di ringkasan "
+        "fleet dan list); pakai --cleanup untuk menghapusnya di akhir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument('--kiosks', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=60, help="Detik")
+        parser.add_argument('--quality-interval', type=float, default=5, help="Detik antar record_quality per kiosk")
+        parser.add_argument('--sale-interval', type=float, default=60, help="Detik antar record_sale per kiosk")
+        parser.add_argument('--dashboard-interval', type=float, default=30,
+                            help="Detik antar pembukaan dashboard per kiosk (0 = tidak ada)")
+        parser.add_argument('--cleanup', action='store_true',
+                            help=f"Hapus machine {LOADGEN_PREFIX}xxxx (beserta datanya) lewat API setelah selesai")
+
+    def handle(self, *args, **options):
+        results = {}
+        lock = threading.Lock()
+
+        def record(name, latency):
+            with lock:
+                latencies, errors = results.setdefault(name, ([], [0]))
+                if latency is None:
+                    errors[0] += 1
+                else:
+                    latencies.append(latency)
+
+        kiosks = [
+            Kiosk(options['url'], f'{LOADGEN_PREFIX}{i:04d}', record)
+            for i in range(options['kiosks'])
+        ]
+        self.register_machines(kiosks)
+        results.clear()
+
+        tasks = [('quality', options['quality_interval'], Kiosk.record_quality),
+                 ('sale', options['sale_interval'], Kiosk.record_sale)]
+        if options['dashboard_interval'] > 0:
+            tasks.append(('dashboard', options['dashboard_interval'], Kiosk.view_dashboard))
+
+        started = time.perf_counter()
+        deadline = started + options['duration']
+
+        def run(kiosk):
+            # Mulai acak di dalam interval supaya kiosk tidak serentak
+            schedule = {name: started + random.uniform(0, interval) for name, interval, _ in tasks}
+            while True:
+                name, interval, func = min(tasks, key=lambda task: schedule[task[0]])
+                wait = schedule[name] - time.perf_counter()
+                if schedule[name] >= deadline:
+                    return
+                if wait > 0:
+                    time.sleep(wait)
+                func(kiosk)
+                schedule[name] += interval
+
+        threads = [threading.Thread(target=run, args=(kiosk,), daemon=True) for kiosk in kiosks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{options['kiosks']} kiosks, {elapsed:.1f}s against {options['url']}")
+        self.stdout.write(HEADER)
+        for name, (latencies, errors) in sorted(results.items()):
+            self.stdout.write(format_row(name, summarize(latencies, errors[0], elapsed)))
+
+        if options['cleanup']:
+            removed = self.remove_machines(kiosks)
+            self.stdout.write(f"Removed {removed} {LOADGEN_PREFIX}xxxx machines")
+
+    def register_machines(self, kiosks):
+        """Buat machine LOAD-xxxx lewat API kalau belum ada."""
+        for kiosk in kiosks:
+            if kiosk.request('setup', 'GET', f'/api/machines/{kiosk.machine_id}/'):
+                continue
+            created = kiosk.request('setup', 'POST', '/api/machines/', {
+                'machine_id': kiosk.machine_id, 'name': f'Loadgen {kiosk.machine_id}',
+                'location': 'Loadgen', 'status': 'online',
+            })
+            if not created:
+                raise CommandError(f"Cannot register {kiosk.machine_id} at {kiosk.host}:{kiosk.port}")
+
+    def remove_machines(self, kiosks):
+        """Hapus machine LOAD-xxxx lewat API. Return jumlah yang terhapus."""
+        removed = 0
+        for kiosk in kiosks:
+            if kiosk.request('cleanup', 'DELETE', f'/api/machines/{kiosk.machine_id}/'):
+                removed += 1
+        return removed
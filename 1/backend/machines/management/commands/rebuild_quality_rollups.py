@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from machines.models import VendingMachine
+from machines.rollups import rebuild_quality_rollups
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang QualityRollup (minute/5min/15min/hour/day) dari data WaterQuality mentah"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machine', help="machine_id; default semua machine")
+
+    def handle(self, *args, **options):
+        machine = None
+        if options['machine']:
+            try:
+                machine = VendingMachine.objects.get(machine_id=options['machine'])
+            except VendingMachine.DoesNotExist:
+                raise CommandError(f"Machine '{options['machine']}' not found")
+
+        created = rebuild_quality_rollups(machine)
+        self.stdout.write(self.style.SUCCESS(f"{created} rollup rows rebuilt"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from machines.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang MachineSnapshot semua machine dari WaterQuality/SalesRecord"
+
+    def handle(self, *args, **options):
+        count = rebuild_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"{count} snapshots rebuilt"))
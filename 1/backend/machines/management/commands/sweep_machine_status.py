@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from machines.liveness import sweep_offline
+
+
+class Command(BaseCommand):
+    help = (
+        "Ubah machine 'online' yang tidak mengirim data selama MACHINE_OFFLINE_AFTER detik "
+        "jadi 'offline'. Jalankan dari cron, atau dengan --every supaya berulang."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help="Ulangi setiap N detik sampai dihentikan (0 = sekali jalan)")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            count = sweep_offline()
+            if count or not options['every']:
+                self.stdout.write(f"{count} machines marked offline")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
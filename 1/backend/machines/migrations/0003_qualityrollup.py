@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0002_waterquality_client_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QualityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='Awal bucket (UTC)')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tds_min', models.FloatField()),
+                ('tds_max', models.FloatField()),
+                ('tds_sum', models.FloatField(default=0)),
+                ('ph_min', models.FloatField()),
+                ('ph_max', models.FloatField()),
+                ('ph_sum', models.FloatField(default=0)),
+                ('water_min', models.FloatField()),
+                ('water_max', models.FloatField()),
+                ('water_sum', models.FloatField(default=0)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quality_rollups', to='machines.vendingmachine')),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='qualityrollup',
+            constraint=models.UniqueConstraint(fields=('machine', 'resolution', 'bucket'), name='unique_quality_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0003_qualityrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesrecord',
+            index=models.Index(fields=['machine', '-timestamp'], name='sale_machine_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waterquality',
+            index=models.Index(fields=['machine', '-timestamp'], name='wq_machine_ts_idx'),
+        ),
+    ]
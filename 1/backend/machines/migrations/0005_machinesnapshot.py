@@ -0,0 +1,64 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:39
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+
+def backfill_snapshots(apps, schema_editor):
+    VendingMachine = apps.get_model('machines', 'VendingMachine')
+    WaterQuality = apps.get_model('machines', 'WaterQuality')
+    SalesRecord = apps.get_model('machines', 'SalesRecord')
+    MachineSnapshot = apps.get_model('machines', 'MachineSnapshot')
+
+    start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=1)
+    for machine in VendingMachine.objects.iterator():
+        latest = WaterQuality.objects.filter(machine=machine).order_by('-timestamp').first()
+        sales = SalesRecord.objects.filter(machine=machine)
+        today = sales.filter(timestamp__gte=start, timestamp__lt=end).aggregate(
+            volume=Sum('volume'), count=Count('id')
+        )
+        seen = [ts for ts in (latest and latest.timestamp, sales.aggregate(last=Max('timestamp'))['last']) if ts]
+        MachineSnapshot.objects.create(
+            machine=machine,
+            last_quality=latest,
+            last_tds_level=latest and latest.tds_level,
+            last_ph_level=latest and latest.ph_level,
+            last_water_level=latest and latest.water_level,
+            last_quality_at=latest and latest.timestamp,
+            last_seen=max(seen) if seen else None,
+            sales_date=start.date(),
+            sales_volume_today=today['volume'] or 0,
+            sales_count_today=today['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0004_machine_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineSnapshot',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='machines.vendingmachine')),
+                ('last_tds_level', models.FloatField(blank=True, null=True)),
+                ('last_ph_level', models.FloatField(blank=True, null=True)),
+                ('last_water_level', models.FloatField(blank=True, null=True)),
+                ('last_quality_at', models.DateTimeField(blank=True, null=True)),
+                ('last_seen', models.DateTimeField(blank=True, help_text='Ingest terakhir (quality atau sale)', null=True)),
+                ('sales_date', models.DateField(blank=True, null=True)),
+                ('sales_volume_today', models.PositiveIntegerField(default=0)),
+                ('sales_count_today', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_quality', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='machines.waterquality')),
+            ],
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
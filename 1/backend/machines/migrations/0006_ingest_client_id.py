@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0005_machinesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesrecord',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='waterquality',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrecord',
+            constraint=models.UniqueConstraint(fields=('machine', 'client_id'), name='unique_sale_client_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='waterquality',
+            constraint=models.UniqueConstraint(fields=('machine', 'client_id'), name='unique_quality_client_id'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0007_vendingmachine_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QualityAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('zscore', 'Spike (z-score)'), ('drift', 'Drift'), ('flatline', 'Flat-line')], max_length=10)),
+                ('metric', models.CharField(choices=[('tds_level', 'TDS'), ('ph_level', 'pH'), ('water_level', 'Water level')], max_length=20)),
+                ('value', models.FloatField(help_text='Nilai reading terakhir saat terdeteksi')),
+                ('score', models.FloatField(help_text='z-score, drift per jam, atau rentang nilai (flat-line)')),
+                ('detected_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_detected_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quality_alerts', to='machines.vendingmachine')),
+            ],
+            options={
+                'ordering': ['-detected_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='qualityalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('machine', 'kind', 'metric'), name='unique_open_quality_alert'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0008_qualityalert'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='machinesnapshot',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Ingest terakhir (quality atau sale)', null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0009_snapshot_last_seen_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day'), ('week', 'Week')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='Awal bucket')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('volume', models.PositiveBigIntegerField(default=0, help_text='Total volume in ml')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='machines.vendingmachine')),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='sales_rollup_res_bucket_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('machine', 'resolution', 'bucket'), name='unique_sales_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0010_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machinesnapshot',
+            name='suppressed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='machinesnapshot',
+            name='suppressed_total',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendingmachine',
+            name='deadband_max_gap',
+            field=models.PositiveIntegerField(default=300, help_text='Detik'),
+        ),
+        migrations.AddField(
+            model_name='vendingmachine',
+            name='deadband_ph',
+            field=models.FloatField(blank=True, help_text='Toleransi pH', null=True),
+        ),
+        migrations.AddField(
+            model_name='vendingmachine',
+            name='deadband_tds',
+            field=models.FloatField(blank=True, help_text='Toleransi TDS (ppm)', null=True),
+        ),
+        migrations.AddField(
+            model_name='vendingmachine',
+            name='deadband_water',
+            field=models.FloatField(blank=True, help_text='Toleransi water level (%)', null=True),
+        ),
+    ]
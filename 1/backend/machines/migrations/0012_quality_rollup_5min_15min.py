@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+METRICS = ['tds', 'ph', 'water']
+
+
+def backfill_rollups(apps, schema_editor):
+    """Bucket 5min/15min digabung dari rollup 'minute' yang sudah ada."""
+    QualityRollup = apps.get_model('machines', 'QualityRollup')
+    machine_pks = QualityRollup.objects.filter(resolution='minute').order_by().values_list('machine_id', flat=True).distinct()
+    for machine_pk in list(machine_pks):
+        for resolution, minutes in [('5min', 5), ('15min', 15)]:
+            combined = {}
+            minute_rollups = QualityRollup.objects.filter(machine_id=machine_pk, resolution='minute')
+            for rollup in minute_rollups.order_by('bucket').iterator(chunk_size=5000):
+                bucket = rollup.bucket.replace(minute=rollup.bucket.minute - rollup.bucket.minute % minutes)
+                agg = combined.get(bucket)
+                if agg is None:
+                    combined[bucket] = QualityRollup(
+                        machine_id=machine_pk, resolution=resolution, bucket=bucket, count=rollup.count,
+                        **{f'{metric}_{part}': getattr(rollup, f'{metric}_{part}')
+                           for metric in METRICS for part in ('min', 'max', 'sum')}
+                    )
+                    continue
+                agg.count += rollup.count
+                for metric in METRICS:
+                    setattr(agg, f'{metric}_min', min(getattr(agg, f'{metric}_min'), getattr(rollup, f'{metric}_min')))
+                    setattr(agg, f'{metric}_max', max(getattr(agg, f'{metric}_max'), getattr(rollup, f'{metric}_max')))
+                    setattr(agg, f'{metric}_sum', getattr(agg, f'{metric}_sum') + getattr(rollup, f'{metric}_sum'))
+            QualityRollup.objects.bulk_create(combined.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0011_deadband'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='qualityrollup',
+            name='resolution',
+            field=models.CharField(choices=[('minute', 'Minute'), ('5min', '5 minutes'), ('15min', '15 minutes'), ('hour', 'Hour'), ('day', 'Day')], max_length=10),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:38
+
+import machines.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0012_quality_rollup_5min_15min'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vendingmachine',
+            name='deadband_max_gap',
+            field=models.PositiveIntegerField(default=300, help_text='Detik', validators=[machines.models.validate_deadband_max_gap]),
+        ),
+    ]
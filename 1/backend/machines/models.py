@@ -1,11 +1,40 @@
 from django.db import models
 
 # Create your models here.
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 
 from django.utils import timezone
 
 
+def today_range():
+    """
+    (awal, akhir) hari ini di timezone aktif. Dipakai sebagai pengganti
+    timestamp__date=today, yang dibungkus fungsi di SQL sehingga index tidak terpakai.
+    """
+    start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def validate_deadband_max_gap(value):
+    """Batas DEADBAND_MAX_GAP_LIMIT; dipakai form admin (full_clean) dan serializer API."""
+    limit = settings.DEADBAND_MAX_GAP_LIMIT
+    if value > limit:
+        raise ValidationError(f"Must be at most {limit} seconds")
+
+
+class VendingMachineQuerySet(models.QuerySet):
+    def with_dashboard_stats(self):
+        """
+        Join ke MachineSnapshot supaya latest quality & penjualan hari ini
+        terbaca tanpa query per machine (N+1).
+        """
+        return self.select_related('snapshot')
+
+
 class VendingMachine(models.Model):
     MACHINE_STATUS = [
         ('online', 'Online'),
@@ -20,19 +49,64 @@ class VendingMachine(models.Model):
     status = models.CharField(max_length=20, choices=MACHINE_STATUS, default='offline')
     last_maintenance = models.DateTimeField(null=True, blank=True)
     installation_date = models.DateTimeField(auto_now_add=True)
+    # Dipakai sebagai validator ETag/Last-Modified API; queryset.update() harus set manual
+    updated_at = models.DateTimeField(auto_now=True)
+    # Deadband ingest (lihat deadband.py): reading hanya disimpan kalau berubah melebihi
+    # toleransi atau sudah deadband_max_gap detik sejak reading tersimpan terakhir.
+    # Semua toleransi kosong = deadband mati (setiap reading disimpan)
+    deadband_tds = models.FloatField(null=True, blank=True, help_text="Toleransi TDS (ppm)")
+    deadband_ph = models.FloatField(null=True, blank=True, help_text="Toleransi pH")
+    deadband_water = models.FloatField(null=True, blank=True, help_text="Toleransi water level (%)")
+    deadband_max_gap = models.PositiveIntegerField(default=300, help_text="Detik",
+                                                   validators=[validate_deadband_max_gap])
+
+    objects = VendingMachineQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.name} ({self.machine_id})"
 
+    def get_snapshot(self):
+        try:
+            return self.snapshot
+        except MachineSnapshot.DoesNotExist:
+            return None
+
+    def get_latest_quality(self):
+        snapshot = self.get_snapshot()
+        if snapshot is None or snapshot.last_quality_at is None:
+            return None
+        return WaterQuality(
+            id=snapshot.last_quality_id, machine=self,
+            tds_level=snapshot.last_tds_level, ph_level=snapshot.last_ph_level,
+            water_level=snapshot.last_water_level, timestamp=snapshot.last_quality_at,
+        )
+
+    def get_sales_today(self):
+        """(volume ml, jumlah transaksi) hari ini, dari snapshot."""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return 0, 0
+        return snapshot.sales_today()
+
 class WaterQuality(models.Model):
     machine = models.ForeignKey(VendingMachine, on_delete=models.CASCADE, related_name='water_qualities')
     tds_level = models.FloatField(help_text="Total Dissolved Solids in ppm")
     ph_level = models.FloatField(help_text="pH level of water")
     water_level = models.FloatField(help_text="Water level in percentage")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default (bukan auto_now_add) supaya batch dari kiosk bisa membawa timestamp sendiri
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Idempotency key dari kiosk; retry/replay dengan client_id sama tidak disimpan dua kali
+    client_id = models.UUIDField(null=True, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # latest quality per machine & range query quality_history
+            models.Index(fields=['machine', '-timestamp'], name='wq_machine_ts_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'client_id'], name='unique_quality_client_id'),
+        ]
 
     @property
     def latest_quality(self):
@@ -40,14 +114,179 @@ class WaterQuality(models.Model):
 
     @property
     def total_sales_today(self):
-        today = timezone.now().date()
-        return self.sales.filter(timestamp__date=today).count()
+        start, end = today_range()
+        return self.sales.filter(timestamp__gte=start, timestamp__lt=end).count()
 
 class SalesRecord(models.Model):
     machine = models.ForeignKey(VendingMachine, on_delete=models.CASCADE, related_name='sales')
     volume = models.IntegerField(help_text="Volume in ml")
     price = models.DecimalField(max_digits=10, decimal_places=2)
     timestamp = models.DateTimeField(auto_now_add=True)
+    client_id = models.UUIDField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['machine', '-timestamp'], name='sale_machine_ts_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'client_id'], name='unique_sale_client_id'),
+        ]
+
+class QualityRollup(models.Model):
+    """Agregat WaterQuality per machine per bucket (1/5/15 menit, jam, hari)."""
+    RESOLUTIONS = [
+        ('minute', 'Minute'),
+        ('5min', '5 minutes'),
+        ('15min', '15 minutes'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    machine = models.ForeignKey(VendingMachine, on_delete=models.CASCADE, related_name='quality_rollups')
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket = models.DateTimeField(help_text="Awal bucket (UTC)")
+    count = models.PositiveIntegerField(default=0)
+    # Simpan sum, bukan avg, supaya bisa di-update secara incremental
+    tds_min = models.FloatField()
+    tds_max = models.FloatField()
+    tds_sum = models.FloatField(default=0)
+    ph_min = models.FloatField()
+    ph_max = models.FloatField()
+    ph_sum = models.FloatField(default=0)
+    water_min = models.FloatField()
+    water_max = models.FloatField()
+    water_sum = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['machine', 'resolution', 'bucket'],
+                name='unique_quality_rollup_bucket'
+            ),
+        ]
+
+    @property
+    def tds_avg(self):
+        return self.tds_sum / self.count if self.count else None
+
+    @property
+    def ph_avg(self):
+        return self.ph_sum / self.count if self.count else None
+
+    @property
+    def water_avg(self):
+        return self.water_sum / self.count if self.count else None
+
+
+
+class SalesRollup(models.Model):
+    """
+    Agregat SalesRecord per machine per bucket (jam/hari/minggu), di-update oleh
+    record_sale. Bucket hari/minggu mengikuti timezone lokal (TIME_ZONE), sama
+    dengan "hari ini" di dashboard; minggu mulai hari Senin.
+    """
+    RESOLUTIONS = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+        ('week', 'Week'),
+    ]
+
+    machine = models.ForeignKey(VendingMachine, on_delete=models.CASCADE, related_name='sales_rollups')
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket = models.DateTimeField(help_text="Awal bucket")
+    count = models.PositiveIntegerField(default=0)
+    volume = models.PositiveBigIntegerField(default=0, help_text="Total volume in ml")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
     class Meta:
-        ordering = ['-timestamp']
\ No newline at end of file
+        ordering = ['bucket']
+        indexes = [
+            # Total fleet per bucket (tanpa filter machine)
+            models.Index(fields=['resolution', 'bucket'], name='sales_rollup_res_bucket_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['machine', 'resolution', 'bucket'],
+                name='unique_sales_rollup_bucket'
+            ),
+        ]
+
+    @property
+    def liters(self):
+        return self.volume / 1000
+
+class MachineSnapshot(models.Model):
+    """
+    State terakhir satu machine (denormalized). Di-update di transaksi yang sama
+    dengan record_quality/record_sale, supaya dashboard tidak perlu query ke
+    WaterQuality/SalesRecord.
+    """
+    machine = models.OneToOneField(VendingMachine, on_delete=models.CASCADE,
+                                   primary_key=True, related_name='snapshot')
+    last_quality = models.ForeignKey(WaterQuality, null=True, blank=True,
+                                     on_delete=models.SET_NULL, related_name='+')
+    last_tds_level = models.FloatField(null=True, blank=True)
+    last_ph_level = models.FloatField(null=True, blank=True)
+    last_water_level = models.FloatField(null=True, blank=True)
+    last_quality_at = models.DateTimeField(null=True, blank=True)
+    # Index untuk sweep status offline (liveness.sweep_offline)
+    last_seen = models.DateTimeField(null=True, blank=True, db_index=True,
+                                     help_text="Ingest terakhir (quality atau sale)")
+    # Counter penjualan berlaku untuk sales_date saja; hari berganti = dianggap 0
+    sales_date = models.DateField(null=True, blank=True)
+    sales_volume_today = models.PositiveIntegerField(default=0)
+    sales_count_today = models.PositiveIntegerField(default=0)
+    # Reading yang tidak disimpan karena deadband: sejak reading tersimpan terakhir, dan total
+    suppressed_count = models.PositiveIntegerField(default=0)
+    suppressed_total = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot {self.machine_id}"
+
+    def sales_today(self):
+        if self.sales_date != timezone.localdate():
+            return 0, 0
+        return self.sales_volume_today, self.sales_count_today
+
+
+class QualityAlert(models.Model):
+    """
+    Anomali water quality dari job detect_quality_anomalies (lihat anomalies.py).
+    Satu alert terbuka per (machine, kind, metric); ditutup (resolved_at) saat
+    kondisi sudah tidak terdeteksi lagi.
+    """
+    KINDS = [
+        ('zscore', 'Spike (z-score)'),
+        ('drift', 'Drift'),
+        ('flatline', 'Flat-line'),
+    ]
+    METRICS = [
+        ('tds_level', 'TDS'),
+        ('ph_level', 'pH'),
+        ('water_level', 'Water level'),
+    ]
+
+    machine = models.ForeignKey(VendingMachine, on_delete=models.CASCADE, related_name='quality_alerts')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    metric = models.CharField(max_length=20, choices=METRICS)
+    value = models.FloatField(help_text="Nilai reading terakhir saat terdeteksi")
+    score = models.FloatField(help_text="z-score, drift per jam, atau rentang nilai (flat-line)")
+    detected_at = models.DateTimeField(default=timezone.now)
+    last_detected_at = models.DateTimeField(default=timezone.now)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-detected_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['machine', 'kind', 'metric'],
+                condition=models.Q(resolved_at__isnull=True),
+                name='unique_open_quality_alert'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.metric} ({self.machine_id})"
@@ -0,0 +1,94 @@
+import base64
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination dengan key (timestamp, id), urutan naik.
+
+    Berbeda dengan PageNumberPagination (OFFSET), setiap halaman hanya
+    `timestamp >= t AND NOT (timestamp = t AND id <= i)` lewat index
+    (machine, timestamp), jadi biayanya konstan sedalam apa pun. Cursor
+    berisi posisi baris terakhir, jadi client bisa melanjutkan dengan tepat
+    setelah koneksi putus.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 500
+    max_page_size = 5000
+    timestamp_field = 'timestamp'
+
+    @staticmethod
+    def encode_cursor(timestamp, pk):
+        raw = f'{timestamp.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            timestamp, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None, extra_rows=None):
+        """
+        extra_rows: opsional, callable(after) -> iterable object di luar queryset (mis. arsip),
+        urut (timestamp, id) dan hanya yang sesudah posisi after (None = dari awal).
+        """
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        field = self.timestamp_field
+        queryset = queryset.order_by(field, 'id')
+
+        after = None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, pk = after = self.decode_cursor(cursor)
+            queryset = queryset.filter(**{f'{field}__gte': timestamp}).exclude(
+                **{field: timestamp, 'id__lte': pk}
+            )
+
+        # Ambil satu baris ekstra untuk tahu apakah masih ada halaman berikutnya
+        rows = list(queryset[:self.page_size_value + 1])
+        if extra_rows is not None:
+            extra = islice(extra_rows(after), self.page_size_value + 1)
+            rows = list(islice(heapq.merge(rows, extra, key=lambda row: (getattr(row, field), row.pk)),
+                               self.page_size_value + 1))
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        self.next_cursor = None
+        if rows:
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            # Cursor baris terakhir selalu dikirim, walau has_next False, supaya
+            # client bisa polling data baru dari posisi yang sama
+            'cursor': self.next_cursor,
+            'results': data,
+        })
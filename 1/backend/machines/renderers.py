@@ -0,0 +1,64 @@
+"""
+Format kolom (columnar) untuk endpoint time series.
+
+Daftar dict per baris mengulang nama field dan timestamp ISO di setiap baris.
+Di sini baris ditranspose jadi array per field, dan timestamp dikirim sebagai
+epoch ms baris pertama (t0) + selisih ms dari baris sebelumnya (dt):
+
+    {"count": 3, "t0": 1700000000000, "dt": [0, 60000, 60000],
+     "columns": {"id": [...], "tds_level": [...], ...}}
+
+Response paginated ({next, cursor, results}) hanya `results`-nya yang diubah;
+response error (dict biasa) dikirim apa adanya.
+"""
+from datetime import datetime
+
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+TIMESTAMP_FIELD = 'timestamp'
+
+
+def to_columnar(rows):
+    fields = [field for field in rows[0] if field != TIMESTAMP_FIELD] if rows else []
+    columns = {field: [row[field] for row in rows] for field in fields}
+    t0 = None
+    dt = []
+    previous = None
+    for row in rows:
+        # Timestamp dari serializer berupa string ISO; "Z" untuk Python < 3.11
+        ms = round(datetime.fromisoformat(row[TIMESTAMP_FIELD].replace('Z', '+00:00')).timestamp() * 1000)
+        if previous is None:
+            t0 = previous = ms
+        dt.append(ms - previous)
+        previous = ms
+    return {'count': len(rows), 't0': t0, 'dt': dt, 'columns': columns}
+
+
+def columnar_data(data):
+    if isinstance(data, list):
+        return to_columnar(data)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return {**data, 'results': to_columnar(data['results'])}
+    return data
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.iot.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar_data(data), accepted_media_type, renderer_context)
+
+
+class MsgPackRenderer(BaseRenderer):
+    """Columnar yang sama, di-encode msgpack (float 32-bit, cukup untuk nilai sensor)."""
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(columnar_data(data), use_single_float=True, default=str)
@@ -0,0 +1,166 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Greatest, Least, Trunc
+
+from .models import QualityRollup, WaterQuality
+
+# Panjang bucket per resolution, dipakai untuk memilih resolution 'auto'
+RESOLUTION_STEPS = {
+    'minute': timedelta(minutes=1),
+    '5min': timedelta(minutes=5),
+    '15min': timedelta(minutes=15),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+# Resolution yang tidak bisa dihitung dengan Trunc di database; saat rebuild
+# digabung dari rollup 'minute'
+DERIVED_FROM_MINUTE = ['5min', '15min']
+
+# Resolution 'auto' memilih bucket terhalus yang jumlah titiknya <= batas ini:
+# 24 jam -> 5min (288), 7 hari -> 15min (672), 30 hari -> hour (720)
+AUTO_MAX_POINTS = 800
+# quality_history auto: bucket boleh sampai sekian kali max_points, lalu dipangkas
+# LTTB ke max_points, supaya spike dari bucket yang lebih halus tetap terlihat
+AUTO_OVERSAMPLE = 2
+
+
+def truncate(timestamp, resolution):
+    """Potong timestamp ke awal bucket (UTC)."""
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    step = RESOLUTION_STEPS[resolution]
+    if step < timedelta(hours=1):
+        minutes = step // timedelta(minutes=1)
+        return timestamp.replace(minute=timestamp.minute - timestamp.minute % minutes, second=0, microsecond=0)
+    if resolution == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def pick_resolution(start_date, end_date, max_buckets=AUTO_MAX_POINTS):
+    span = end_date - start_date
+    for resolution, step in RESOLUTION_STEPS.items():
+        if span / step <= max_buckets:
+            return resolution
+    return 'day'
+
+
+def _aggregate(readings, resolution):
+    buckets = {}
+    for reading in readings:
+        key = truncate(reading.timestamp, resolution)
+        values = (reading.tds_level, reading.ph_level, reading.water_level)
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = {
+                'count': 1,
+                'min': list(values),
+                'max': list(values),
+                'sum': list(values),
+            }
+            continue
+        agg['count'] += 1
+        for i, value in enumerate(values):
+            agg['min'][i] = min(agg['min'][i], value)
+            agg['max'][i] = max(agg['max'][i], value)
+            agg['sum'][i] += value
+    return buckets
+
+
+def _apply(machine, resolution, bucket, agg):
+    rollups = QualityRollup.objects.filter(machine=machine, resolution=resolution, bucket=bucket)
+    tds, ph, water = zip(agg['min'], agg['max'], agg['sum'])
+    changes = dict(
+        count=F('count') + agg['count'],
+        tds_min=Least('tds_min', tds[0]), tds_max=Greatest('tds_max', tds[1]), tds_sum=F('tds_sum') + tds[2],
+        ph_min=Least('ph_min', ph[0]), ph_max=Greatest('ph_max', ph[1]), ph_sum=F('ph_sum') + ph[2],
+        water_min=Least('water_min', water[0]), water_max=Greatest('water_max', water[1]),
+        water_sum=F('water_sum') + water[2],
+    )
+    if rollups.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            QualityRollup.objects.create(
+                machine=machine, resolution=resolution, bucket=bucket, count=agg['count'],
+                tds_min=tds[0], tds_max=tds[1], tds_sum=tds[2],
+                ph_min=ph[0], ph_max=ph[1], ph_sum=ph[2],
+                water_min=water[0], water_max=water[1], water_sum=water[2],
+            )
+    except IntegrityError:
+        # Request lain membuat bucket yang sama duluan
+        rollups.update(**changes)
+
+
+def update_quality_rollups(machine, readings):
+    """
+    Tambahkan readings (WaterQuality yang baru disimpan) ke semua rollup.
+    Dipanggil di transaksi yang sama dengan insert-nya.
+    """
+    for resolution in RESOLUTION_STEPS:
+        for bucket, agg in _aggregate(readings, resolution).items():
+            _apply(machine, resolution, bucket, agg)
+
+
+def rebuild_quality_rollups(machine=None):
+    """Hitung ulang semua rollup dari data mentah (backfill)."""
+    qualities = WaterQuality.objects.order_by()
+    rollups = QualityRollup.objects.all()
+    if machine is not None:
+        qualities = qualities.filter(machine=machine)
+        rollups = rollups.filter(machine=machine)
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        for resolution in RESOLUTION_STEPS:
+            if resolution in DERIVED_FROM_MINUTE:
+                objs = _combine(minute_objs, resolution)
+            else:
+                rows = qualities.annotate(
+                    bucket=Trunc('timestamp', resolution, tzinfo=dt_timezone.utc)
+                ).values('machine_id', 'bucket').annotate(
+                    n=Count('id'),
+                    tds_lo=Min('tds_level'), tds_hi=Max('tds_level'), tds_total=Sum('tds_level'),
+                    ph_lo=Min('ph_level'), ph_hi=Max('ph_level'), ph_total=Sum('ph_level'),
+                    water_lo=Min('water_level'), water_hi=Max('water_level'), water_total=Sum('water_level'),
+                )
+                objs = [
+                    QualityRollup(
+                        machine_id=row['machine_id'], resolution=resolution, bucket=row['bucket'],
+                        count=row['n'],
+                        tds_min=row['tds_lo'], tds_max=row['tds_hi'], tds_sum=row['tds_total'],
+                        ph_min=row['ph_lo'], ph_max=row['ph_hi'], ph_sum=row['ph_total'],
+                        water_min=row['water_lo'], water_max=row['water_hi'], water_sum=row['water_total'],
+                    )
+                    for row in rows
+                ]
+            if resolution == 'minute':
+                minute_objs = objs
+            QualityRollup.objects.bulk_create(objs, batch_size=1000)
+            created += len(objs)
+    return created
+
+
+def _combine(minute_rollups, resolution):
+    """Gabung rollup 'minute' jadi bucket `resolution` yang lebih kasar."""
+    combined = {}
+    for rollup in minute_rollups:
+        key = (rollup.machine_id, truncate(rollup.bucket, resolution))
+        agg = combined.get(key)
+        if agg is None:
+            combined[key] = QualityRollup(
+                machine_id=key[0], resolution=resolution, bucket=key[1], count=rollup.count,
+                tds_min=rollup.tds_min, tds_max=rollup.tds_max, tds_sum=rollup.tds_sum,
+                ph_min=rollup.ph_min, ph_max=rollup.ph_max, ph_sum=rollup.ph_sum,
+                water_min=rollup.water_min, water_max=rollup.water_max, water_sum=rollup.water_sum,
+            )
+            continue
+        agg.count += rollup.count
+        for metric in ('tds', 'ph', 'water'):
+            setattr(agg, f'{metric}_min', min(getattr(agg, f'{metric}_min'), getattr(rollup, f'{metric}_min')))
+            setattr(agg, f'{metric}_max', max(getattr(agg, f'{metric}_max'), getattr(rollup, f'{metric}_max')))
+            setattr(agg, f'{metric}_sum', getattr(agg, f'{metric}_sum') + getattr(rollup, f'{metric}_sum'))
+    return list(combined.values())
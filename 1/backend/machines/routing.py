@@ -0,0 +1,7 @@
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/machines/<str:machine_id>/quality/', consumers.QualityConsumer.as_asgi()),
+]
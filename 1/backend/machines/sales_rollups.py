@@ -0,0 +1,118 @@
+"""
+Rollup penjualan (SalesRollup) per jam/hari/minggu dan query analytics-nya.
+
+record_sale menambah satu baris ke setiap resolution (UPDATE count/volume/revenue
++ nilai baru), jadi dashboard revenue cukup membaca rollup, berapa pun jumlah
+SalesRecord-nya.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import SalesRecord, SalesRollup
+
+SALES_RESOLUTIONS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+# Range default kalau start_date tidak diisi
+DEFAULT_SPANS = {
+    'hour': timedelta(days=1),
+    'day': timedelta(days=30),
+    'week': timedelta(weeks=12),
+}
+
+TOTAL_FIELDS = {'count': Sum('count'), 'volume': Sum('volume'), 'revenue': Sum('revenue')}
+
+
+def truncate_local(timestamp, resolution):
+    """Awal bucket di timezone lokal (minggu mulai Senin), sama seperti Trunc(..., tzinfo=lokal)."""
+    local = timezone.localtime(timestamp)
+    if resolution == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == 'week':
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def _apply(machine, resolution, bucket, count, volume, revenue):
+    rollups = SalesRollup.objects.filter(machine=machine, resolution=resolution, bucket=bucket)
+    changes = dict(count=F('count') + count, volume=F('volume') + volume, revenue=F('revenue') + revenue)
+    if rollups.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(machine=machine, resolution=resolution, bucket=bucket,
+                                       count=count, volume=volume, revenue=revenue)
+    except IntegrityError:
+        # Request lain membuat bucket yang sama duluan
+        rollups.update(**changes)
+
+
+def update_sales_rollups(machine, sales):
+    """Tambahkan sales (SalesRecord baru) ke semua rollup; di transaksi yang sama dengan insert-nya."""
+    for resolution in SALES_RESOLUTIONS:
+        buckets = {}
+        for sale in sales:
+            key = truncate_local(sale.timestamp, resolution)
+            count, volume, revenue = buckets.get(key, (0, 0, 0))
+            buckets[key] = (count + 1, volume + sale.volume, revenue + sale.price)
+        for bucket, (count, volume, revenue) in buckets.items():
+            _apply(machine, resolution, bucket, count, volume, revenue)
+
+
+def rebuild_sales_rollups(machine=None):
+    """Hitung ulang semua SalesRollup dari SalesRecord (backfill)."""
+    sales = SalesRecord.objects.order_by()
+    rollups = SalesRollup.objects.all()
+    if machine is not None:
+        sales = sales.filter(machine=machine)
+        rollups = rollups.filter(machine=machine)
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        for resolution in SALES_RESOLUTIONS:
+            rows = sales.annotate(
+                bucket=Trunc('timestamp', resolution, tzinfo=timezone.get_current_timezone())
+            ).values('machine_id', 'bucket').annotate(
+                n=Count('id'), total_volume=Sum('volume'), total_revenue=Sum('price'),
+            )
+            objs = [
+                SalesRollup(machine_id=row['machine_id'], resolution=resolution, bucket=row['bucket'],
+                            count=row['n'], volume=row['total_volume'], revenue=row['total_revenue'])
+                for row in rows
+            ]
+            SalesRollup.objects.bulk_create(objs, batch_size=1000)
+            created += len(objs)
+    return created
+
+
+def _totals(row):
+    row['count'] = row['count'] or 0
+    row['volume'] = row['volume'] or 0
+    row['liters'] = row['volume'] / 1000
+    # Format sama dengan DecimalField di serializer (string, 2 desimal)
+    row['revenue'] = f"{row['revenue'] or 0:.2f}"
+    return row
+
+
+def fleet_sales(resolution, start_date, end_date):
+    """Total fleet per bucket, per machine, dan keseluruhan untuk range (dari rollup saja)."""
+    rollups = SalesRollup.objects.filter(
+        resolution=resolution, bucket__range=(truncate_local(start_date, resolution), end_date)
+    )
+    totals = rollups.aggregate(**TOTAL_FIELDS)
+    series = rollups.values('bucket').annotate(**TOTAL_FIELDS).order_by('bucket')
+    machines = rollups.values('machine__machine_id').annotate(**TOTAL_FIELDS).order_by('-revenue')
+    return {
+        'totals': _totals(totals),
+        'series': [_totals({'timestamp': row.pop('bucket'), **row}) for row in series],
+        'machines': [_totals({'machine_id': row.pop('machine__machine_id'), **row}) for row in machines],
+    }
@@ -0,0 +1,98 @@
+"""
+Search machine (name, location, machine_id; substring, case-insensitive) lewat index.
+
+- SQLite: tabel FTS5 dengan tokenizer trigram (external content, disinkronkan
+  trigger). Term < 3 karakter tidak punya trigram, jadi pakai LIKE biasa.
+- PostgreSQL: extension pg_trgm + index GIN trigram di UPPER(kolom); filter
+  icontains Django (UPPER(kolom) LIKE ...) otomatis memakai index ini.
+
+Index dipasang lewat post_migrate (install_search_index), bukan migration:
+migration SQLite yang mengubah tabel VendingMachine membuat ulang tabelnya dan
+menghapus trigger, jadi trigger dipasang ulang dan index di-rebuild setiap migrate.
+"""
+import logging
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'machines_vendingmachine'
+FTS_TABLE = 'machines_vendingmachine_fts'
+SEARCH_FIELDS = ['machine_id', 'name', 'location']
+
+# Minimal panjang term untuk FTS5 trigram
+MIN_TRIGRAM_LENGTH = 3
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+_old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+
+SQLITE_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_columns}, content='{TABLE}', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRES_STATEMENTS = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f'CREATE INDEX IF NOT EXISTS machine_{field}_trgm_idx ON {TABLE} USING gin (UPPER({field}) gin_trgm_ops)'
+    for field in SEARCH_FIELDS
+]
+
+# alias database -> apakah index FTS5 ada
+_fts_ready = {}
+
+
+def install_search_index(connection):
+    """Pasang/perbaiki index search. Kalau gagal (mis. FTS5/pg_trgm tidak tersedia) search tetap jalan tanpa index."""
+    statements = {'sqlite': SQLITE_STATEMENTS, 'postgresql': POSTGRES_STATEMENTS}.get(connection.vendor)
+    if statements is None or TABLE not in connection.introspection.table_names():
+        return False
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    except DatabaseError:
+        logger.warning("Machine search index not installed on %s; falling back to LIKE",
+                       connection.alias, exc_info=True)
+        _fts_ready[connection.alias] = False
+        return False
+    _fts_ready[connection.alias] = connection.vendor == 'sqlite'
+    return True
+
+
+def install_search_index_handler(sender, using, **kwargs):
+    install_search_index(connections[using])
+
+
+def _has_fts(connection):
+    if connection.alias not in _fts_ready:
+        _fts_ready[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready[connection.alias]
+
+
+def search_machines(queryset, term):
+    """Filter queryset VendingMachine dengan term (substring di name/location/machine_id)."""
+    term = term.strip()
+    if not term:
+        return queryset
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH and _has_fts(connection):
+        # Phrase FTS5: tanda kutip di-escape dengan digandakan
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [phrase]
+        ))
+    return queryset.filter(
+        Q(name__icontains=term) |
+        Q(location__icontains=term) |
+        Q(machine_id__icontains=term)
+    )
@@ -1,15 +1,49 @@
 from rest_framework import serializers
-from .models import VendingMachine, WaterQuality, SalesRecord
+from .models import VendingMachine, WaterQuality, SalesRecord, QualityRollup, SalesRollup
 
 class WaterQualitySerializer(serializers.ModelSerializer):
     class Meta:
         model = WaterQuality
-        fields = ['id', 'tds_level', 'ph_level', 'water_level', 'timestamp']
+        fields = ['id', 'tds_level', 'ph_level', 'water_level', 'timestamp', 'client_id']
+        read_only_fields = ['timestamp']
+        # client_id hanya input (idempotency key), tidak perlu ikut di setiap baris history
+        extra_kwargs = {'client_id': {'write_only': True}}
+
+class WaterQualityReadingSerializer(serializers.ModelSerializer):
+    """Satu baris dari record_quality_batch; timestamp wajib diisi oleh kiosk."""
+    timestamp = serializers.DateTimeField()
+
+    class Meta:
+        model = WaterQuality
+        fields = ['tds_level', 'ph_level', 'water_level', 'timestamp', 'client_id']
+
+class QualityRollupSerializer(serializers.ModelSerializer):
+    # Nama field sama dengan WaterQualitySerializer (nilai rata-rata) supaya chart tetap jalan
+    timestamp = serializers.DateTimeField(source='bucket')
+    tds_level = serializers.FloatField(source='tds_avg')
+    ph_level = serializers.FloatField(source='ph_avg')
+    water_level = serializers.FloatField(source='water_avg')
+
+    class Meta:
+        model = QualityRollup
+        fields = ['timestamp', 'count',
+                  'tds_level', 'tds_min', 'tds_max',
+                  'ph_level', 'ph_min', 'ph_max',
+                  'water_level', 'water_min', 'water_max']
 
 class SalesRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = SalesRecord
-        fields = ['id', 'volume', 'price', 'timestamp']
+        fields = ['id', 'volume', 'price', 'timestamp', 'client_id']
+        extra_kwargs = {'client_id': {'write_only': True}}
+
+class SalesRollupSerializer(serializers.ModelSerializer):
+    timestamp = serializers.DateTimeField(source='bucket')
+    liters = serializers.FloatField()
+
+    class Meta:
+        model = SalesRollup
+        fields = ['timestamp', 'count', 'volume', 'liters', 'revenue']
 
 class VendingMachineSerializer(serializers.ModelSerializer):
     latest_quality = serializers.SerializerMethodField()
@@ -19,18 +53,15 @@ class VendingMachineSerializer(serializers.ModelSerializer):
         model = VendingMachine
         fields = ['id', 'machine_id', 'name', 'location', 'status', 
                  'last_maintenance', 'installation_date', 'latest_quality',
-                 'total_sales_today']
+                 'total_sales_today',
+                 'deadband_tds', 'deadband_ph', 'deadband_water', 'deadband_max_gap']
 
     def get_latest_quality(self, obj):
-        latest = obj.water_qualities.first()
+        latest = obj.get_latest_quality()
         if latest:
             return WaterQualitySerializer(latest).data
         return None
 
     def get_total_sales_today(self, obj):
-        from django.utils import timezone
-        from django.db.models import Sum
-        today = timezone.now().date()
-        return obj.sales.filter(
-            timestamp__date=today
-        ).aggregate(Sum('volume'))['volume__sum'] or 0
\ No newline at end of file
+        volume, _ = obj.get_sales_today()
+        return volume
\ No newline at end of file
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .lookup import forget_machine
+from .models import VendingMachine
+from .summary import invalidate_fleet_summary
+
+
+@receiver(post_init, sender=VendingMachine)
+def remember_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status
+    instance._loaded_machine_id = instance.machine_id
+
+
+@receiver(post_save, sender=VendingMachine)
+def machine_saved(sender, instance, created, **kwargs):
+    if created or instance.status != instance._loaded_status:
+        invalidate_fleet_summary()
+    # Hapus juga machine_id lama kalau di-rename
+    forget_machine(*{instance.machine_id, instance._loaded_machine_id} - {None, ''})
+    instance._loaded_status = instance.status
+    instance._loaded_machine_id = instance.machine_id
+
+
+@receiver(post_delete, sender=VendingMachine)
+def machine_deleted(sender, instance, **kwargs):
+    invalidate_fleet_summary()
+    forget_machine(instance.machine_id)
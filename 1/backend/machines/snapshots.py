@@ -0,0 +1,74 @@
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import MachineSnapshot, VendingMachine, today_range
+
+
+def locked_snapshot(machine):
+    snapshot, _ = MachineSnapshot.objects.select_for_update().get_or_create(machine=machine)
+    return snapshot
+
+
+def apply_qualities(machine, qualities):
+    """Update snapshot dengan reading terbaru dari qualities (harus di dalam transaksi)."""
+    latest = max(qualities, key=lambda quality: quality.timestamp)
+    snapshot = locked_snapshot(machine)
+    # Batch replay bisa membawa data lama; jangan timpa reading yang lebih baru
+    if snapshot.last_quality_at is None or latest.timestamp >= snapshot.last_quality_at:
+        snapshot.last_quality = latest
+        snapshot.last_tds_level = latest.tds_level
+        snapshot.last_ph_level = latest.ph_level
+        snapshot.last_water_level = latest.water_level
+        snapshot.last_quality_at = latest.timestamp
+        snapshot.suppressed_count = 0
+    snapshot.last_seen = timezone.now()
+    snapshot.save()
+    return snapshot
+
+
+def apply_sale(machine, sale):
+    """Tambahkan sale ke counter hari ini (harus di dalam transaksi)."""
+    snapshot = locked_snapshot(machine)
+    today = timezone.localdate()
+    if snapshot.sales_date != today:
+        snapshot.sales_date = today
+        snapshot.sales_volume_today = 0
+        snapshot.sales_count_today = 0
+    if timezone.localdate(sale.timestamp) == today:
+        snapshot.sales_volume_today += sale.volume
+        snapshot.sales_count_today += 1
+    snapshot.last_seen = timezone.now()
+    snapshot.save()
+    return snapshot
+
+
+def rebuild_snapshot(machine):
+    """Hitung ulang snapshot satu machine dari WaterQuality/SalesRecord."""
+    start, end = today_range()
+    latest = machine.water_qualities.first()
+    sales = machine.sales.filter(timestamp__gte=start, timestamp__lt=end).aggregate(
+        volume=Sum('volume'), count=Count('id')
+    )
+    last_sale = machine.sales.aggregate(last=Max('timestamp'))['last']
+    seen = [ts for ts in (latest and latest.timestamp, last_sale) if ts]
+
+    snapshot, _ = MachineSnapshot.objects.get_or_create(machine=machine)
+    snapshot.last_quality = latest
+    snapshot.last_tds_level = latest and latest.tds_level
+    snapshot.last_ph_level = latest and latest.ph_level
+    snapshot.last_water_level = latest and latest.water_level
+    snapshot.last_quality_at = latest and latest.timestamp
+    snapshot.last_seen = max(seen) if seen else None
+    snapshot.sales_date = start.date()
+    snapshot.sales_volume_today = sales['volume'] or 0
+    snapshot.sales_count_today = sales['count']
+    snapshot.save()
+    return snapshot
+
+
+def rebuild_snapshots():
+    count = 0
+    for machine in VendingMachine.objects.iterator():
+        rebuild_snapshot(machine)
+        count += 1
+    return count
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import VendingMachine
+
+FLEET_SUMMARY_KEY = 'machines:fleet_summary'
+
+
+def get_fleet_summary():
+    """
+    Jumlah machine total dan per status. Disimpan di cache (CACHES['default'])
+    dan di-invalidate oleh signal saat status machine berubah (lihat signals.py).
+    """
+    summary = cache.get(FLEET_SUMMARY_KEY)
+    if summary is None:
+        summary = {status: 0 for status, _ in VendingMachine.MACHINE_STATUS}
+        for row in VendingMachine.objects.order_by().values('status').annotate(total=Count('id')):
+            summary[row['status']] = row['total']
+        summary['total'] = sum(summary.values())
+        cache.set(FLEET_SUMMARY_KEY, summary, settings.FLEET_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_fleet_summary():
+    cache.delete(FLEET_SUMMARY_KEY)
@@ -1,3 +1,1204 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import OperationalError, connection
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .buffer import QualityIngestBuffer
+from . import archive as archive_module
+from .archive import archive_quality
+from .anomalies import DEFAULTS as ANOMALY_DEFAULTS, FleetWindow, detect, run_detection
+from .benchmarking import summarize
+from .consumers import quality_group
+from .downsampling import downsample_indices, lttb_indices
+from .ingest import save_readings
+from .liveness import sweep_offline
+from .management.commands.loadgen import LOADGEN_PREFIX, Kiosk
+from .lookup import LRUCache, clear_local_cache, resolve_machine
+from .pagination import KeysetPagination
+from .models import (
+    VendingMachine, WaterQuality, SalesRecord, MachineSnapshot, QualityRollup, QualityAlert, SalesRollup,
+    today_range,
+)
+from .rollups import AUTO_MAX_POINTS, pick_resolution, rebuild_quality_rollups
+from .routing import websocket_urlpatterns
+from .sales_rollups import rebuild_sales_rollups
+from .search import search_machines
+from .snapshots import rebuild_snapshots
+from .summary import FLEET_SUMMARY_KEY, get_fleet_summary
+
+
+MACHINES = 20
+READINGS_PER_MACHINE = 1000
+SALES_PER_MACHINE = 200
+
+# Budget latency (detik) per request di dataset sintetis; sengaja longgar untuk CI
+LATENCY_BUDGET = 0.25
+
+
+def seed_fleet():
+    """Isi database dengan fleet sintetis: reading tiap 30 detik, sale tiap 5 menit."""
+    now = timezone.now()
+    machines = VendingMachine.objects.bulk_create([
+        VendingMachine(machine_id=f'VM{i:04d}', name=f'Machine {i}', location=f'Lokasi {i % 5}',
+                       status='online' if i % 2 else 'offline')
+        for i in range(MACHINES)
+    ])
+    qualities = []
+    sales = []
+    for machine in machines:
+        for n in range(READINGS_PER_MACHINE):
+            qualities.append(WaterQuality(
+                machine=machine, tds_level=100 + n % 50, ph_level=7 + (n % 10) / 10,
+                water_level=100 - n % 100, timestamp=now - timedelta(seconds=30 * n)
+            ))
+        for n in range(SALES_PER_MACHINE):
+            sales.append(SalesRecord(machine=machine, volume=300, price='3000.00'))
+    WaterQuality.objects.bulk_create(qualities, batch_size=5000)
+    SalesRecord.objects.bulk_create(sales, batch_size=5000)
+    rebuild_quality_rollups()
+    rebuild_snapshots()
+    return machines
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "Assertion plan ditulis untuk format EXPLAIN SQLite")
+class QueryPlanTests(TestCase):
+    """Pastikan query hot path di views.py/serializers.py memakai index (machine, timestamp)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.machines = seed_fleet()
+        cls.machine = cls.machines[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotIn('SCAN', plan.replace('SCAN CONSTANT', ''))
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_latest_quality_uses_index(self):
+        self.assertUsesIndex(self.machine.water_qualities.all()[:1], 'wq_machine_ts_idx')
+
+    def test_quality_history_range_uses_index(self):
+        end = timezone.now()
+        qualities = self.machine.water_qualities.filter(
+            timestamp__range=(end - timedelta(hours=24), end)
+        ).order_by('timestamp')
+        self.assertUsesIndex(qualities, 'wq_machine_ts_idx')
+
+    def test_quality_rollup_range_uses_index(self):
+        end = timezone.now()
+        rollups = self.machine.quality_rollups.filter(
+            resolution='hour', bucket__range=(end - timedelta(days=7), end)
+        ).order_by('bucket')
+        self.assertIn('qualityrollup', rollups.explain())
+        self.assertNotIn('TEMP B-TREE', rollups.explain())
+        self.assertIn('USING INDEX', rollups.explain())
+
+    def test_sales_today_uses_index(self):
+        start, end = today_range()
+        sales = self.machine.sales.filter(timestamp__gte=start, timestamp__lt=end)
+        self.assertUsesIndex(sales, 'sale_machine_ts_idx')
+
+    def test_machine_lookup_uses_unique_index(self):
+        plan = VendingMachine.objects.filter(machine_id=self.machine.machine_id).explain()
+        self.assertIn('USING INDEX', plan)
+
+
+class LatencyBudgetTests(TestCase):
+    """Latency endpoint hot di atas dataset sintetis."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.machines = seed_fleet()
+        cls.machine = cls.machines[0]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertWithinBudget(self, method, url, data=None):
+        started = time.perf_counter()
+        response = getattr(self.client, method)(url, data, format='json')
+        elapsed = time.perf_counter() - started
+        self.assertLess(response.status_code, 300, response.content[:200])
+        self.assertLess(elapsed, LATENCY_BUDGET, f'{url} took {elapsed * 1000:.1f} ms')
+        return response
+
+    def test_record_quality(self):
+        self.assertWithinBudget(
+            'post', f'/api/machines/{self.machine.machine_id}/record_quality/',
+            {'tds_level': 120, 'ph_level': 7.1, 'water_level': 80}
+        )
+
+    def test_quality_history_raw(self):
+        self.assertWithinBudget('get', f'/api/machines/{self.machine.machine_id}/quality-history/')
+
+    def test_quality_history_auto_resolution(self):
+        end = timezone.now()
+        start = end - timedelta(days=30)
+        response = self.assertWithinBudget(
+            'get', f'/api/machines/{self.machine.machine_id}/quality-history/',
+            {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'resolution': 'auto'}
+        )
+        self.assertLessEqual(len(response.json()), AUTO_MAX_POINTS)
+
+    def test_machine_list_api(self):
+        self.assertWithinBudget('get', '/api/machines/')
+
+    def test_machine_list_page(self):
+        self.assertWithinBudget('get', '/')
+
+    def test_machine_detail_page(self):
+        self.assertWithinBudget('get', f'/machine/{self.machine.pk}/')
+
+
+class AutoResolutionTests(TestCase):
+    """resolution=auto harus memberi beberapa ratus titik, bukan ribuan atau puluhan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        cls.end = timezone.now()
+        # Satu reading per 5 menit selama 31 hari
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=100 + n % 7, ph_level=7, water_level=50,
+                         timestamp=cls.end - timedelta(minutes=5 * n))
+            for n in range(31 * 24 * 12)
+        ], batch_size=5000)
+        rebuild_quality_rollups()
+
+    def test_picks_intermediate_buckets(self):
+        self.assertEqual(pick_resolution(self.end - timedelta(hours=24), self.end), '5min')
+        self.assertEqual(pick_resolution(self.end - timedelta(days=7), self.end), '15min')
+        self.assertEqual(pick_resolution(self.end - timedelta(days=30), self.end), 'hour')
+        # Resolution yang dipakai dikirim ke client (dashboard menggabung reading live per bucket)
+        response = APIClient().get('/api/machines/VM1/quality-history/', {'resolution': 'auto'})
+        self.assertEqual(response['X-Resolution'], 'minute')
+        self.assertEqual(APIClient().get('/api/machines/VM1/quality-history/')['X-Resolution'], 'raw')
+
+    def test_bucket_counts(self):
+        client = APIClient()
+        for span in [timedelta(hours=24), timedelta(days=7), timedelta(days=30)]:
+            response = client.get('/api/machines/VM1/quality-history/', {
+                'start_date': (self.end - span).isoformat(), 'end_date': self.end.isoformat(),
+                'resolution': 'auto',
+            })
+            self.assertGreaterEqual(len(response.json()), 200, span)
+            self.assertLessEqual(len(response.json()), AUTO_MAX_POINTS, span)
+
+    def test_auto_is_capped_with_lttb(self):
+        # Reading per menit: 24 jam = 1440 bucket minute, dipangkas LTTB ke max_points
+        machine = VendingMachine.objects.create(machine_id='VM2', name='Machine 2', location='Lokasi')
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=100 + n % 13, ph_level=7 + n % 5 / 10, water_level=50,
+                         timestamp=self.end - timedelta(minutes=n))
+            for n in range(24 * 60)
+        ])
+        rebuild_quality_rollups(machine)
+        params = {'start_date': (self.end - timedelta(hours=24)).isoformat(), 'end_date': self.end.isoformat(),
+                  'resolution': 'auto', 'max_points': 800}
+        rows = APIClient().get('/api/machines/VM2/quality-history/', params).json()
+        self.assertLessEqual(len(rows), 800)
+        # Lebih rapat dari bucket 5min (289 titik)
+        self.assertGreater(len(rows), 400)
+        self.assertEqual(rows, sorted(rows, key=lambda row: row['timestamp']))
+
+
+class NumQueriesTests(TestCase):
+    """List API, halaman list dan detail harus memakai jumlah query konstan."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(10):
+            machine = VendingMachine.objects.create(machine_id=f'VM{i}', name=f'Machine {i}', location='Lokasi')
+            WaterQuality.objects.create(machine=machine, tds_level=100, ph_level=7, water_level=90)
+            WaterQuality.objects.create(machine=machine, tds_level=110 + i, ph_level=7.2, water_level=80)
+            SalesRecord.objects.create(machine=machine, volume=300, price='3000.00')
+            SalesRecord.objects.create(machine=machine, volume=600, price='5000.00')
+        rebuild_snapshots()
+
+    def test_machine_list_api(self):
+        # validator ETag + count untuk pagination + query list ber-annotation
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/machines/')
+        first = response.json()['results'][0]
+        self.assertEqual(first['latest_quality']['tds_level'], 110)
+        self.assertEqual(first['total_sales_today'], 900)
+
+    def test_machine_retrieve_api(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/machines/VM3/')
+        self.assertEqual(response.json()['latest_quality']['tds_level'], 113)
+
+    def test_machine_list_page(self):
+        # count untuk pagination + page + ringkasan fleet (cache masih kosong)
+        with self.assertNumQueries(3):
+            response = self.client.get('/')
+        self.assertEqual(response.context['total_machines'], 10)
+        self.assertEqual(response.context['machines'][0].latest_quality.tds_level, 110)
+        # Ringkasan fleet sekarang dari cache
+        with self.assertNumQueries(2):
+            self.client.get('/?page=2')
+
+    def test_machine_detail_page(self):
+        machine = VendingMachine.objects.get(machine_id='VM3')
+        # machine ber-annotation + recent sales
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/machine/{machine.pk}/')
+        self.assertEqual(response.context['total_sales_today'], 2)
+        self.assertContains(response, '<span id="statTds">113.0</span> ppm')
+
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+
+    def test_ingest_updates_snapshot(self):
+        self.client.post('/api/machines/VM1/record_quality/',
+                         {'tds_level': 120, 'ph_level': 7.1, 'water_level': 80}, format='json')
+        self.client.post('/api/machines/VM1/record_sale/', {'volume': 300, 'price': '3000.00'}, format='json')
+        self.client.post('/api/machines/VM1/record_sale/', {'volume': 600, 'price': '5000.00'}, format='json')
+        snapshot = MachineSnapshot.objects.get(machine=self.machine)
+        self.assertEqual(snapshot.last_tds_level, 120)
+        self.assertEqual(snapshot.sales_today(), (900, 2))
+
+    def test_old_batch_does_not_overwrite_latest(self):
+        self.client.post('/api/machines/VM1/record_quality/',
+                         {'tds_level': 120, 'ph_level': 7.1, 'water_level': 80}, format='json')
+        self.client.post('/api/machines/VM1/record_quality_batch/', [
+            {'tds_level': 90, 'ph_level': 7, 'water_level': 50, 'timestamp': '2024-01-01T00:00:00Z'},
+        ], format='json')
+        self.assertEqual(MachineSnapshot.objects.get(machine=self.machine).last_tds_level, 120)
+
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LiveTelemetryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(quality_group('VM1'), self.channel)
+
+    def test_record_quality_pushes_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/machines/VM1/record_quality/',
+                             {'tds_level': 120, 'ph_level': 7.1, 'water_level': 80}, format='json')
+        message = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual(message['type'], 'quality.readings')
+        self.assertEqual(message['readings'][0]['tds_level'], 120)
+
+    def test_consumer_forwards_readings(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/machines/VM1/quality/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await self.layer.group_send(quality_group('VM1'), {
+                'type': 'quality.readings', 'readings': [{'tds_level': 99}],
+            })
+            self.assertEqual(await communicator.receive_json_from(), {'readings': [{'tds_level': 99}]})
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        now = timezone.now()
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=100 + n, ph_level=7, water_level=50,
+                         timestamp=now - timedelta(minutes=n))
+            for n in range(5)
+        ])
+        SalesRecord.objects.create(machine=machine, volume=300, price='3000.00')
+
+    def test_export_quality_ndjson(self):
+        response = self.client.get('/api/machines/VM1/export_quality/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['tds_level'] for row in rows], [104, 103, 102, 101, 100])
+
+    def test_export_sales_csv_gzip(self):
+        response = self.client.get('/api/machines/VM1/export_sales/', {'output': 'csv', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(lines[0], 'id,volume,price,timestamp')
+        self.assertIn(',300,3000.00,', lines[1])
+
+    def test_export_varies_on_accept_encoding(self):
+        for encoding in ['gzip', '']:
+            response = self.client.get('/api/machines/VM1/export_quality/', HTTP_ACCEPT_ENCODING=encoding)
+            self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertNotIn('Content-Encoding', response)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        start = timezone.now() - timedelta(hours=1)
+        # Beberapa baris dengan timestamp sama untuk menguji tie-breaker id
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=n, ph_level=7, water_level=50,
+                         timestamp=start + timedelta(minutes=n // 3))
+            for n in range(25)
+        ])
+
+    def test_walk_all_pages(self):
+        seen = []
+        url = '/api/machines/VM1/quality-history/?page_size=4'
+        # 7 halaman x (lookup machine + satu query keyset)
+        with self.assertNumQueries(14):
+            while url:
+                body = self.client.get(url).json()
+                seen += [row['tds_level'] for row in body['results']]
+                url = body['next']
+        self.assertEqual(seen, list(range(25)))
+
+    def test_resume_from_cursor(self):
+        first = self.client.get('/api/machines/VM1/quality-history/', {'page_size': 5}).json()
+        resumed = self.client.get('/api/machines/VM1/quality-history/', {'cursor': first['cursor'], 'page_size': 5}).json()
+        self.assertEqual([row['tds_level'] for row in resumed['results']], [5, 6, 7, 8, 9])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/machines/VM1/quality-history/', {'cursor': 'xx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DownsamplingTests(TestCase):
+    def test_lttb_keeps_spike_and_endpoints(self):
+        x = np.arange(10000, dtype=float)
+        y = np.full(10000, 7.0)
+        y[4321] = 11.5
+        keep = lttb_indices(x, y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertIn(4321, keep)
+        self.assertEqual((keep[0], keep[-1]), (0, 9999))
+
+    def test_quality_history_max_points(self):
+        machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        start = timezone.now() - timedelta(hours=5)
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=900 if n == 777 else 100, ph_level=7, water_level=50,
+                         timestamp=start + timedelta(seconds=5 * n))
+            for n in range(3000)
+        ])
+        response = self.client.get('/api/machines/VM1/quality-history/', {'max_points': 300})
+        rows = response.json()
+        self.assertLessEqual(len(rows), 300)
+        self.assertIn(900, [row['tds_level'] for row in rows])
+        self.assertEqual(rows, sorted(rows, key=lambda row: row['timestamp']))
+
+    def test_small_max_points(self):
+        x = np.arange(1000, dtype=float)
+        rng = np.random.default_rng(0)
+        series = [rng.normal(size=1000) for _ in range(3)]
+        for max_points in range(9, 20):
+            self.assertLessEqual(len(downsample_indices(x, series, max_points)), max_points)
+        with self.assertRaises(ValueError):
+            downsample_indices(x, series, 8)
+
+        VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        response = self.client.get('/api/machines/VM1/quality-history/', {'max_points': 5})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('>= 9', response.json()['error'])
+
+
+class IdempotentIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+
+    def test_record_sale_retry_is_not_duplicated(self):
+        payload = {'volume': 300, 'price': '3000.00', 'client_id': str(uuid.uuid4())}
+        first = self.client.post('/api/machines/VM1/record_sale/', payload, format='json')
+        retry = self.client.post('/api/machines/VM1/record_sale/', payload, format='json')
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.machine.sales.count(), 1)
+        self.assertEqual(self.machine.get_sales_today(), (300, 1))
+
+    def test_record_quality_retry_is_not_duplicated(self):
+        payload = {'tds_level': 120, 'ph_level': 7.1, 'water_level': 80, 'client_id': str(uuid.uuid4())}
+        self.client.post('/api/machines/VM1/record_quality/', payload, format='json')
+        self.client.post('/api/machines/VM1/record_quality/', payload, format='json')
+        self.assertEqual(self.machine.water_qualities.count(), 1)
+
+    def test_batch_replay_skips_known_rows(self):
+        readings = [
+            {'tds_level': n, 'ph_level': 7, 'water_level': 50,
+             'timestamp': f'2024-01-01T00:00:{n:02d}Z', 'client_id': str(uuid.uuid4())}
+            for n in range(4)
+        ]
+        self.client.post('/api/machines/VM1/record_quality_batch/', readings[:2], format='json')
+        response = self.client.post('/api/machines/VM1/record_quality_batch/', readings + readings[3:], format='json')
+        self.assertEqual(response.json(), {'created': 2, 'duplicates': 3, 'suppressed': 0})
+        self.assertEqual(self.machine.water_qualities.count(), 4)
+        self.assertEqual(QualityRollup.objects.get(machine=self.machine, resolution='day').count, 4)
+
+    def test_batch_invalid_rows_save_nothing(self):
+        readings = [
+            {'tds_level': 100, 'ph_level': 7, 'water_level': 50, 'timestamp': '2024-01-01T00:00:00Z'},
+            {'tds_level': 'abc', 'ph_level': 7, 'water_level': 50, 'timestamp': '2024-01-01T00:00:01Z'},
+            {'tds_level': 102, 'ph_level': 7, 'water_level': 50, 'timestamp': '2024-01-01T00:00:02Z'},
+            {'tds_level': 103, 'ph_level': 7, 'water_level': 50},
+        ]
+        response = self.client.post('/api/machines/VM1/record_quality_batch/', readings, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        # Satu entri per baris, urutan sama dengan input; baris valid = {}
+        self.assertEqual(len(errors), 4)
+        self.assertEqual((errors[0], errors[2]), ({}, {}))
+        self.assertIn('tds_level', errors[1])
+        self.assertIn('timestamp', errors[3])
+        self.assertEqual(self.machine.water_qualities.count(), 0)
+
+    @mock.patch('machines.views.MAX_QUALITY_BATCH', 3)
+    def test_batch_size_cap(self):
+        readings = [
+            {'tds_level': n, 'ph_level': 7, 'water_level': 50, 'timestamp': f'2024-01-01T00:00:{n:02d}Z'}
+            for n in range(4)
+        ]
+        response = self.client.post('/api/machines/VM1/record_quality_batch/', {'readings': readings}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('max 3', response.json()['error'])
+        self.assertEqual(self.machine.water_qualities.count(), 0)
+        response = self.client.post('/api/machines/VM1/record_quality_batch/', readings[:3], format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+@override_settings(QUALITY_INGEST_MODE='buffered')
+class BufferedIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        # Interval panjang supaya flush hanya terjadi saat dipanggil dari test
+        self.buffer = QualityIngestBuffer({'FLUSH_INTERVAL_MS': 3600 * 1000, 'BATCH_SIZE': 100, 'MAX_ROWS': 3})
+        patcher = mock.patch('machines.views.get_quality_buffer', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.buffer.shutdown)
+
+    def post_reading(self, **extra):
+        return self.client.post('/api/machines/VM1/record_quality/',
+                                {'tds_level': 120, 'ph_level': 7.1, 'water_level': 80, **extra}, format='json')
+
+    def test_accepts_then_flushes_in_one_batch(self):
+        client_id = str(uuid.uuid4())
+        self.assertEqual(self.post_reading(client_id=client_id).status_code, 202)
+        self.assertEqual(self.post_reading(client_id=client_id).status_code, 202)
+        self.assertEqual(self.post_reading().status_code, 202)
+        self.assertEqual(self.machine.water_qualities.count(), 0)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.machine.water_qualities.count(), 2)
+        self.assertEqual(self.machine.get_snapshot().last_tds_level, 120)
+
+    def test_database_error_keeps_readings(self):
+        other = VendingMachine.objects.create(machine_id='VM2', name='Machine 2', location='Lokasi')
+        self.post_reading()
+        self.post_reading()
+        self.buffer.enqueue(other.pk, {'tds_level': 130, 'ph_level': 7, 'water_level': 70})
+
+        real_save = save_readings
+        calls = []
+
+        def locked_once(machine, rows):
+            calls.append(machine.pk)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return real_save(machine, rows)
+
+        with mock.patch('machines.ingest.save_readings', side_effect=locked_once), \
+                self.assertLogs('machines.buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 1)
+            self.assertEqual((self.machine.water_qualities.count(), other.water_qualities.count()), (0, 1))
+            self.assertEqual(len(self.buffer.backend), 2)
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.machine.water_qualities.count(), 2)
+        self.assertEqual(self.buffer.dropped, 0)
+
+    def test_drops_after_repeated_failures(self):
+        self.post_reading()
+        with mock.patch('machines.ingest.save_readings', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('machines.buffer', 'ERROR'):
+            for _ in range(self.buffer.max_attempts - 1):
+                self.assertEqual(self.buffer.flush(), 0)
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(len(self.buffer.backend), 0)
+        self.assertEqual(self.buffer.dropped, 1)
+
+    def test_full_buffer_returns_503(self):
+        for _ in range(3):
+            self.post_reading()
+        response = self.post_reading()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.buffer.flush()
+
+
+
+class FleetSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        VendingMachine.objects.create(machine_id='VM2', name='Machine 2', location='Lokasi', status='online')
+
+    def test_summary_counts(self):
+        summary = get_fleet_summary()
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['online'], 1)
+        self.assertEqual(summary['offline'], 1)
+        self.assertEqual(summary['error'], 0)
+
+    def test_status_change_invalidates(self):
+        get_fleet_summary()
+        machine = VendingMachine.objects.get(pk=self.machine.pk)
+        machine.name = 'Renamed'
+        machine.save()
+        self.assertIsNotNone(cache.get(FLEET_SUMMARY_KEY))
+        machine.status = 'online'
+        machine.save()
+        self.assertIsNone(cache.get(FLEET_SUMMARY_KEY))
+        self.assertEqual(get_fleet_summary()['online'], 2)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.client.post('/api/machines/VM1/record_quality/',
+                         {'tds_level': 100, 'ph_level': 7, 'water_level': 50}, format='json')
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+        # Reading baru harus menghasilkan ETag baru
+        time.sleep(0.001)
+        self.client.post('/api/machines/VM1/record_quality/',
+                         {'tds_level': 120, 'ph_level': 7, 'water_level': 50}, format='json')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+
+    def test_list(self):
+        self.assert_revalidates('/api/machines/')
+
+    def test_retrieve(self):
+        self.assert_revalidates('/api/machines/VM1/')
+
+    def test_quality_history(self):
+        end = (timezone.now() + timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
+        self.assert_revalidates(f'/api/machines/VM1/quality-history/?end_date={end}')
+
+    def test_not_modified_skips_serialization(self):
+        etag = self.client.get('/api/machines/VM1/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/machines/VM1/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_machine_update_changes_list_etag(self):
+        etag = self.client.get('/api/machines/')['ETag']
+        self.client.patch('/api/machines/VM1/', {'status': 'online'}, format='json')
+        self.assertEqual(self.client.get('/api/machines/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MachineLookupCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.payload = {'tds_level': 100, 'ph_level': 7, 'water_level': 50}
+
+    def test_ingest_skips_machine_query(self):
+        self.client.post('/api/machines/VM1/record_quality/', self.payload, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/machines/VM1/record_quality/', self.payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'FROM "machines_vendingmachine"' in q['sql']])
+
+    @override_settings(MACHINE_LOOKUP_SHARED_CACHE=True)
+    def test_falls_back_to_cache_backend(self):
+        resolve_machine('VM1')
+        clear_local_cache()
+        with self.assertNumQueries(0):
+            machine = resolve_machine('VM1')
+        self.assertEqual((machine.pk, machine.status), (self.machine.pk, 'offline'))
+
+    def test_local_cache_backend_skipped(self):
+        # LocMem hanya terlihat di proses ini; setelah TTL lokal habis harus kembali ke database
+        resolve_machine('VM1')
+        clear_local_cache()
+        with self.assertNumQueries(1):
+            resolve_machine('VM1')
+
+    def test_save_and_delete_invalidate(self):
+        resolve_machine('VM1')
+        self.machine.status = 'online'
+        self.machine.save()
+        self.assertEqual(resolve_machine('VM1').status, 'online')
+
+        self.machine.machine_id = 'VM1-NEW'
+        self.machine.save()
+        self.assertEqual(self.client.post('/api/machines/VM1/record_sale/',
+                                          {'volume': 300, 'price': '3000.00'}, format='json').status_code, 404)
+        self.assertEqual(resolve_machine('VM1-NEW').pk, self.machine.pk)
+
+        self.machine.delete()
+        self.assertEqual(self.client.post('/api/machines/VM1-NEW/record_quality/',
+                                          self.payload, format='json').status_code, 404)
+
+    def test_resolved_machine_saves_only_loaded_fields(self):
+        machine = resolve_machine('VM1')
+        machine.status = 'online'
+        machine.save()
+        self.machine.refresh_from_db()
+        self.assertEqual((self.machine.status, self.machine.name), ('online', 'Machine 1'))
+
+
+class ColumnarFormatTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.start = (timezone.now() - timedelta(hours=1)).replace(microsecond=0)
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=machine, tds_level=100 + n, ph_level=7, water_level=50,
+                         timestamp=self.start + timedelta(minutes=n))
+            for n in range(5)
+        ])
+        self.url = '/api/machines/VM1/quality-history/'
+
+    def assert_columnar(self, body):
+        self.assertEqual(body['count'], 5)
+        self.assertEqual(body['t0'], int(self.start.timestamp() * 1000))
+        self.assertEqual(body['dt'], [0, 60000, 60000, 60000, 60000])
+        self.assertEqual(body['columns']['tds_level'], [100, 101, 102, 103, 104])
+        self.assertNotIn('timestamp', body['columns'])
+
+    def test_columnar_json(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/vnd.iot.columnar+json')
+        self.assertEqual(response['Content-Type'], 'application/vnd.iot.columnar+json')
+        self.assert_columnar(json.loads(response.content))
+        # Default tetap list dict seperti sebelumnya
+        self.assertEqual(len(self.client.get(self.url).json()), 5)
+
+    def test_msgpack(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/x-msgpack')
+        self.assertEqual(response['Content-Type'], 'application/x-msgpack')
+        self.assert_columnar(msgpack.unpackb(response.content))
+        self.assertIn('Accept', response['Vary'])
+
+    def test_paginated_and_errors(self):
+        body = json.loads(self.client.get(self.url, {'page_size': 10, 'format': 'columnar'}).content)
+        self.assert_columnar(body['results'])
+        self.assertIsNone(body['next'])
+        error = self.client.get(self.url, {'resolution': 'week', 'format': 'columnar'})
+        self.assertEqual(error.status_code, 400)
+        self.assertIn('error', json.loads(error.content))
+
+    def test_etag_depends_on_format(self):
+        plain = self.client.get(self.url)['ETag']
+        columnar = self.client.get(self.url, HTTP_ACCEPT='application/vnd.iot.columnar+json')['ETag']
+        self.assertNotEqual(plain, columnar)
+
+
+class AnomalyDetectionTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.normal, self.spike, self.flat = [
+            VendingMachine.objects.create(machine_id=f'VM{i}', name=f'Machine {i}', location='Lokasi')
+            for i in range(3)
+        ]
+        rng = np.random.default_rng(1)
+        rows = []
+        for minute in range(60, 0, -1):
+            timestamp = self.now - timedelta(minutes=minute)
+            for machine in (self.normal, self.spike):
+                rows.append(WaterQuality(machine=machine, tds_level=100 + rng.normal(0, 2), ph_level=7 + rng.normal(0, 0.05),
+                                         water_level=60 + rng.normal(0, 1), timestamp=timestamp))
+            rows.append(WaterQuality(machine=self.flat, tds_level=100 + rng.normal(0, 2), ph_level=7.0,
+                                     water_level=60 + rng.normal(0, 1), timestamp=timestamp))
+        rows.append(WaterQuality(machine=self.spike, tds_level=400, ph_level=7, water_level=60, timestamp=self.now))
+        WaterQuality.objects.bulk_create(rows)
+
+    def findings(self):
+        window = FleetWindow.load(self.now - timedelta(hours=1))
+        return {(f.machine_pk, f.kind, f.metric) for f in detect(window, ANOMALY_DEFAULTS, self.now)}
+
+    def test_detects_spike_and_flatline(self):
+        self.assertEqual(self.findings(), {
+            (self.spike.pk, 'zscore', 'tds_level'),
+            (self.flat.pk, 'flatline', 'ph_level'),
+        })
+
+    def test_drift(self):
+        for quality in WaterQuality.objects.filter(machine=self.normal):
+            minutes_ago = (self.now - quality.timestamp).total_seconds() / 60
+            quality.tds_level += (60 - minutes_ago) * 2  # +120 ppm per jam
+            quality.save()
+        self.assertIn((self.normal.pk, 'drift', 'tds_level'), self.findings())
+
+    def test_alert_lifecycle(self):
+        stats = run_detection(now=self.now)
+        self.assertEqual((stats['machines'], stats['created'], stats['resolved']), (3, 2, 0))
+        # Putaran berikutnya: alert yang sama tidak diduplikasi
+        self.assertEqual(run_detection(now=self.now)['created'], 0)
+        self.assertEqual(QualityAlert.objects.filter(resolved_at__isnull=True).count(), 2)
+
+        WaterQuality.objects.filter(machine=self.spike, tds_level=400).delete()
+        stats = run_detection(now=self.now)
+        self.assertEqual(stats['resolved'], 1)
+        alert = QualityAlert.objects.get(machine=self.spike)
+        self.assertIsNotNone(alert.resolved_at)
+
+
+class DeletedMachineIngestTests(TransactionTestCase):
+    """Machine dihapus di worker lain: cache lookup di sini masih menyimpannya."""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        resolve_machine('VM1')
+        with mock.patch('machines.signals.forget_machine'):
+            self.machine.delete()
+
+    def test_record_quality_returns_404(self):
+        response = self.client.post('/api/machines/VM1/record_quality/',
+                                    {'tds_level': 100, 'ph_level': 7, 'water_level': 50}, format='json')
+        self.assertEqual(response.status_code, 404)
+        with self.assertRaises(VendingMachine.DoesNotExist):
+            resolve_machine('VM1')
+
+    def test_record_sale_returns_404(self):
+        response = self.client.post('/api/machines/VM1/record_sale/',
+                                    {'volume': 300, 'price': '3000.00'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_record_quality_batch_returns_404(self):
+        response = self.client.post('/api/machines/VM1/record_quality_batch/', [
+            {'tds_level': 100, 'ph_level': 7, 'water_level': 50, 'timestamp': timezone.now().isoformat()},
+        ], format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class LivenessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.payload = {'tds_level': 100, 'ph_level': 7, 'water_level': 50}
+
+    def ingest(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/machines/VM1/record_quality/', self.payload, format='json')
+
+    def test_ingest_marks_online(self):
+        self.assertEqual(get_fleet_summary()['online'], 0)
+        self.ingest()
+        self.machine.refresh_from_db()
+        self.assertEqual(self.machine.status, 'online')
+        self.assertEqual(get_fleet_summary()['online'], 1)
+        # Sudah online: tidak ada UPDATE status lagi
+        with CaptureQueriesContext(connection) as queries:
+            self.ingest()
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "machines_vendingmachine"')])
+
+    def test_sweep_marks_offline(self):
+        self.ingest()
+        self.assertEqual(sweep_offline(), 0)
+        later = timezone.now() + timedelta(seconds=settings.MACHINE_OFFLINE_AFTER + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_offline(now=later), 1)
+        self.machine.refresh_from_db()
+        self.assertEqual(self.machine.status, 'offline')
+        self.assertEqual(get_fleet_summary()['online'], 0)
+        # Heartbeat berikutnya membuatnya online lagi
+        self.ingest()
+        self.machine.refresh_from_db()
+        self.assertEqual(self.machine.status, 'online')
+
+    def test_sweep_from_other_process(self):
+        self.ingest()
+        resolve_machine('VM1')  # cache worker ini: 'online'
+        later = timezone.now() + timedelta(seconds=settings.MACHINE_OFFLINE_AFTER + 1)
+        # Proses sweep punya cache sendiri; cache worker ini tidak ikut terhapus
+        other_cache = LocMemCache('sweep-process', {})
+        with mock.patch('machines.lookup.cache', other_cache), \
+                mock.patch('machines.lookup._local', LRUCache(10, 30)), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_offline(now=later), 1)
+        self.assertEqual(resolve_machine('VM1').status, 'online')
+        # Setelah interval cek lewat, heartbeat berikutnya membaca status dari database
+        skip = time.monotonic() + settings.MACHINE_SEEN_CHECK_INTERVAL + 1
+        with mock.patch('machines.lookup.time.monotonic', return_value=skip):
+            self.ingest()
+        self.machine.refresh_from_db()
+        self.assertEqual(self.machine.status, 'online')
+        self.assertEqual(get_fleet_summary()['online'], 1)
+
+    def test_manual_statuses_untouched(self):
+        VendingMachine.objects.create(machine_id='VM2', name='Machine 2', location='Lokasi', status='online')
+        self.machine.status = 'maintenance'
+        self.machine.save()
+        self.ingest()
+        later = timezone.now() + timedelta(seconds=settings.MACHINE_OFFLINE_AFTER + 1)
+        self.assertEqual(sweep_offline(now=later), 1)  # hanya VM2 (online tanpa snapshot)
+        self.machine.refresh_from_db()
+        self.assertEqual(self.machine.status, 'maintenance')
+
+
+class SinceDeltaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.start = (timezone.now() - timedelta(hours=1)).replace(second=0, microsecond=0)
+        qualities = WaterQuality.objects.bulk_create([
+            WaterQuality(machine=self.machine, tds_level=n, ph_level=7, water_level=50,
+                         timestamp=self.start + timedelta(minutes=n // 2))
+            for n in range(10)
+        ])
+        rebuild_quality_rollups(self.machine)
+        self.url = '/api/machines/VM1/quality-history/'
+        self.qualities = qualities
+
+    def test_since_timestamp(self):
+        since = (self.start + timedelta(minutes=3)).isoformat()
+        rows = self.client.get(self.url, {'since': since}).json()
+        self.assertEqual(sorted(row['tds_level'] for row in rows), [8, 9])
+
+    def test_since_cursor_handles_equal_timestamps(self):
+        # Baris 6 & 7 punya timestamp sama; cursor di baris 6 tetap mengembalikan baris 7
+        cursor = KeysetPagination.encode_cursor(self.qualities[6].timestamp, self.qualities[6].pk)
+        rows = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual([row['tds_level'] for row in rows], [7, 8, 9])
+
+    def test_since_rollups_resend_current_bucket(self):
+        since = (self.start + timedelta(minutes=3, seconds=30)).isoformat()
+        rows = self.client.get(self.url, {'since': since, 'resolution': 'minute'}).json()
+        self.assertEqual([row['count'] for row in rows], [2, 2])
+
+    def test_invalid_since(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'kemarin'}).status_code, 400)
+
+
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(2):
+            VendingMachine.objects.create(machine_id=f'VM{i}', name=f'Machine {i}', location='Lokasi')
+        for machine_id, volume, price in [('VM0', 300, '3000.00'), ('VM0', 600, '5000.00'), ('VM1', 600, '5000.00')]:
+            self.client.post(f'/api/machines/{machine_id}/record_sale/',
+                             {'volume': volume, 'price': price}, format='json')
+
+    def rollup_state(self):
+        return sorted(SalesRollup.objects.values_list(
+            'machine__machine_id', 'resolution', 'bucket', 'count', 'volume', 'revenue'
+        ))
+
+    def test_record_sale_updates_rollups(self):
+        day = SalesRollup.objects.get(machine__machine_id='VM0', resolution='day')
+        self.assertEqual((day.count, day.volume, day.revenue), (2, 900, 8000))
+        self.assertEqual(SalesRollup.objects.filter(machine__machine_id='VM0').count(), 3)
+        incremental = self.rollup_state()
+        rebuild_sales_rollups()
+        self.assertEqual(self.rollup_state(), incremental)
+
+    def test_machine_analytics(self):
+        rows = self.client.get('/api/machines/VM0/sales_analytics/', {'resolution': 'hour'}).json()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['count'], 2)
+        self.assertEqual(rows[0]['liters'], 0.9)
+        self.assertEqual(rows[0]['revenue'], '8000.00')
+        self.assertEqual(self.client.get('/api/machines/VM0/sales_analytics/', {'resolution': 'month'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/machines/XX/sales_analytics/').status_code, 404)
+
+    def test_fleet_analytics(self):
+        # total + series + per machine, semuanya dari rollup
+        with self.assertNumQueries(3):
+            body = self.client.get('/api/machines/fleet_sales_analytics/', {'resolution': 'week'}).json()
+        self.assertEqual(body['totals'], {'count': 3, 'volume': 1500, 'liters': 1.5, 'revenue': '13000.00'})
+        self.assertEqual(len(body['series']), 1)
+        self.assertEqual([row['machine_id'] for row in body['machines']], ['VM0', 'VM1'])
+
+
+class QualityArchiveTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        retention = override_settings(QUALITY_RETENTION={'RAW_DAYS': 30, 'ARCHIVE_DIR': archive_dir.name})
+        retention.enable()
+        self.addCleanup(retention.disable)
+
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        self.now = timezone.now()
+        # Satu reading per hari selama 60 hari, plus satu reading terbaru untuk snapshot
+        WaterQuality.objects.bulk_create([
+            WaterQuality(machine=self.machine, tds_level=day, ph_level=7, water_level=50,
+                         timestamp=self.now - timedelta(days=day, microseconds=day))
+            for day in range(60, 0, -1)
+        ])
+        rebuild_snapshots()
+        self.url = '/api/machines/VM1/quality-history/'
+        self.range = {'start_date': (self.now - timedelta(days=61)).isoformat(),
+                      'end_date': self.now.isoformat()}
+
+    def test_archive_moves_old_rows(self):
+        before = self.client.get(self.url, self.range).json()
+        stats = archive_quality(now=self.now)
+        self.assertEqual(stats['rows'], 31)  # hari ke-30 sedikit lebih tua dari cutoff
+        self.assertEqual(WaterQuality.objects.count(), 29)
+        # quality_history tetap mengembalikan data yang sama, termasuk timestamp mikrodetik
+        after = self.client.get(self.url, self.range).json()
+        self.assertEqual(after, before)
+
+    def test_archive_is_idempotent_and_merges(self):
+        archive_quality(now=self.now)
+        archive_quality(now=self.now + timedelta(days=5))
+        self.assertEqual(WaterQuality.objects.count(), 24)
+        rows = self.client.get(self.url, self.range).json()
+        self.assertEqual([row['tds_level'] for row in rows], list(range(60, 0, -1)))
+
+    def test_late_row_with_lower_id_is_kept(self):
+        # Reading backdated yang commit setelah arsip dibaca, dengan id lebih kecil
+        # (sequence Postgres): tidak boleh ikut terhapus tanpa diarsipkan
+        late_id = WaterQuality.objects.order_by('id').values_list('id', flat=True).first() - 1
+        read_month = archive_module._read_month
+
+        def read_then_insert(qualities):
+            columns = read_month(qualities)
+            if columns is not None and not WaterQuality.objects.filter(id=late_id).exists():
+                # Bulan yang sama dengan yang baru saja dibaca
+                timestamp = archive_module.from_micros(int(columns['timestamp'][0]) + 1)
+                WaterQuality.objects.create(id=late_id, machine=self.machine, tds_level=999, ph_level=7,
+                                            water_level=50, timestamp=timestamp)
+            return columns
+
+        with mock.patch('machines.archive._read_month', side_effect=read_then_insert):
+            archive_quality(now=self.now)
+        self.assertTrue(WaterQuality.objects.filter(id=late_id).exists())
+        archive_quality(now=self.now)
+        self.assertFalse(WaterQuality.objects.filter(id=late_id).exists())
+        rows = self.client.get(self.url, self.range).json()
+        self.assertEqual(len(rows), 61)
+
+    def test_keyset_pages_include_archive(self):
+        archive_quality(now=self.now)
+        tds, params = [], {**self.range, 'page_size': 7}
+        while True:
+            body = self.client.get(self.url, params).json()
+            tds.extend(row['tds_level'] for row in body['results'])
+            if not body['next']:
+                break
+            params['cursor'] = body['cursor']
+        self.assertEqual(tds, list(range(60, 0, -1)))
+
+    def test_export_includes_archive(self):
+        archive_quality(now=self.now)
+        response = self.client.get('/api/machines/VM1/export_quality/', self.range)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['tds_level'] for row in rows], list(range(60, 0, -1)))
+
+    def test_since_and_max_points_include_archive(self):
+        archive_quality(now=self.now)
+        since = (self.now - timedelta(days=40, hours=12)).isoformat()
+        rows = self.client.get(self.url, {**self.range, 'since': since}).json()
+        self.assertEqual(len(rows), 40)
+        rows = self.client.get(self.url, {**self.range, 'max_points': 10}).json()
+        self.assertLessEqual(len(rows), 10)
+        self.assertEqual(rows[0]['tds_level'], 60)
+
+
+class DeadbandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.machine = VendingMachine.objects.create(
+            machine_id='VM1', name='Machine 1', location='Lokasi',
+            deadband_tds=2, deadband_ph=0.1, deadband_max_gap=600,
+        )
+        self.url = '/api/machines/VM1/record_quality/'
+
+    def post(self, tds, ph=7.0, water=50):
+        return self.client.post(self.url, {'tds_level': tds, 'ph_level': ph, 'water_level': water}, format='json')
+
+    def test_repeats_are_suppressed(self):
+        self.post(100)
+        self.assertEqual(self.post(101).json()['status'], 'suppressed')
+        self.assertEqual(self.post(100, ph=7.05).json()['suppressed_count'], 2)
+        self.post(103)  # TDS berubah > 2 ppm
+        self.post(103, water=49)  # water tanpa toleransi: perubahan apa pun disimpan
+        self.assertEqual(list(WaterQuality.objects.order_by('timestamp').values_list('tds_level', flat=True)),
+                         [100, 103, 103])
+        snapshot = MachineSnapshot.objects.get(machine=self.machine)
+        self.assertEqual((snapshot.suppressed_count, snapshot.suppressed_total), (0, 2))
+
+    def test_max_gap_heartbeat(self):
+        self.post(100)
+        WaterQuality.objects.update(timestamp=timezone.now() - timedelta(minutes=11))
+        MachineSnapshot.objects.update(last_quality_at=timezone.now() - timedelta(minutes=11))
+        self.assertNotIn('status', self.post(100).json())
+        self.assertEqual(WaterQuality.objects.count(), 2)
+
+    def test_batch_counts_suppressed(self):
+        self.post(100)
+        now = timezone.now()
+        readings = [{'tds_level': tds, 'ph_level': 7, 'water_level': 50,
+                     'timestamp': (now + timedelta(seconds=i)).isoformat()}
+                    for i, tds in enumerate([100, 100.5, 110, 110, 90])]
+        body = self.client.post('/api/machines/VM1/record_quality_batch/', readings, format='json').json()
+        self.assertEqual(body, {'created': 2, 'duplicates': 0, 'suppressed': 3})
+
+    def test_stuck_sensor_still_raises_flatline(self):
+        self.machine.deadband_max_gap = 300
+        self.machine.save()
+        silent = VendingMachine.objects.create(machine_id='VM2', name='Machine 2', location='Lokasi',
+                                               deadband_tds=2, deadband_max_gap=300)
+        now = timezone.now()
+
+        def send(machine_id, seconds_ago):
+            # Reading pertama selalu disimpan (snapshot masih kosong), sisanya lewat deadband
+            for batch in (seconds_ago[:1], seconds_ago[1:]):
+                self.client.post(f'/api/machines/{machine_id}/record_quality_batch/', [
+                    {'tds_level': 100, 'ph_level': 7, 'water_level': 50,
+                     'timestamp': (now - timedelta(seconds=s)).isoformat()}
+                    for s in batch
+                ], format='json')
+
+        send('VM1', list(range(40 * 60, -1, -30)))
+        # VM2 berhenti mengirim 20 menit lalu: tidak cukup bukti untuk flatline
+        send('VM2', list(range(40 * 60, 20 * 60 - 1, -30)))
+        stored = WaterQuality.objects.filter(machine=self.machine, timestamp__gte=now - timedelta(minutes=30))
+        self.assertLess(stored.count(), ANOMALY_DEFAULTS['FLATLINE_MIN_READINGS'])
+
+        run_detection(now=now)
+        alerts = QualityAlert.objects.filter(kind='flatline')
+        self.assertEqual(set(alerts.values_list('machine__machine_id', 'metric')),
+                         {('VM1', 'tds_level'), ('VM1', 'ph_level'), ('VM1', 'water_level')})
+        self.assertFalse(alerts.filter(machine=silent).exists())
+
+    def test_rejects_max_gap_that_starves_flatline(self):
+        response = self.client.patch('/api/machines/VM1/', {'deadband_max_gap': 3600}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('deadband_max_gap', response.json())
+
+    def test_admin_uses_same_max_gap_limit(self):
+        # Form admin memanggil full_clean; aturan yang sama dengan API (validator model)
+        self.machine.deadband_max_gap = settings.DEADBAND_MAX_GAP_LIMIT + 1
+        with self.assertRaises(ValidationError) as ctx:
+            self.machine.full_clean()
+        self.assertIn('deadband_max_gap', ctx.exception.message_dict)
+        self.machine.deadband_max_gap = settings.DEADBAND_MAX_GAP_LIMIT
+        self.machine.full_clean()
+
+    def test_disabled_by_default(self):
+        VendingMachine.objects.create(machine_id='VM2', name='Machine 2', location='Lokasi')
+        for _ in range(3):
+            self.client.post('/api/machines/VM2/record_quality/',
+                             {'tds_level': 100, 'ph_level': 7, 'water_level': 50}, format='json')
+        self.assertEqual(WaterQuality.objects.filter(machine__machine_id='VM2').count(), 3)
+
+
+class MachineSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        VendingMachine.objects.create(machine_id='JKT-001', name='Depot Air Sehat', location='Jakarta Pusat')
+        VendingMachine.objects.create(machine_id='BDG-002', name='Kiosk Dago', location='Bandung')
+        VendingMachine.objects.create(machine_id='SBY-003', name='Tirta "Segar"', location='Surabaya')
+
+    def search(self, term):
+        return sorted(search_machines(VendingMachine.objects.all(), term).values_list('machine_id', flat=True))
+
+    def test_substring_any_field(self):
+        self.assertEqual(self.search('jakarta pus'), ['JKT-001'])
+        self.assertEqual(self.search('dago'), ['BDG-002'])
+        self.assertEqual(self.search('-00'), ['BDG-002', 'JKT-001', 'SBY-003'])
+        self.assertEqual(self.search('"segar"'), ['SBY-003'])
+        # Term pendek (tanpa trigram) tetap jalan lewat LIKE
+        self.assertEqual(self.search('ta'), ['JKT-001', 'SBY-003'])
+
+    def test_index_follows_updates(self):
+        machine = VendingMachine.objects.get(machine_id='BDG-002')
+        machine.location = 'Bogor'
+        machine.save()
+        self.assertEqual(self.search('bandung'), [])
+        self.assertEqual(self.search('bogor'), ['BDG-002'])
+        machine.delete()
+        self.assertEqual(self.search('bogor'), [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 hanya di SQLite')
+    def test_uses_fts_index(self):
+        plan = search_machines(VendingMachine.objects.all(), 'jakarta').explain()
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+
+    def test_list_view_search(self):
+        response = self.client.get('/', {'search': 'surabaya'})
+        self.assertEqual([machine.machine_id for machine in response.context['machines']], ['SBY-003'])
+
+
+class LoadgenTests(LiveServerTestCase):
+    def test_kiosk_and_summarize(self):
+        VendingMachine.objects.create(machine_id='VM1', name='Machine 1', location='Lokasi')
+        recorded = []
+        kiosk = Kiosk(self.live_server_url, 'VM1', lambda name, latency: recorded.append((name, latency)))
+        self.assertTrue(kiosk.record_quality())
+        self.assertTrue(kiosk.record_sale())
+        kiosk.view_dashboard()
+        failed = []
+        self.assertFalse(Kiosk(self.live_server_url, 'VM404', lambda name, latency: failed.append(latency)).record_sale())
+        self.assertEqual(failed, [None])
+        self.assertEqual([name for name, _ in recorded],
+                         ['record_quality', 'record_sale', 'quality_history', 'machine_list'])
+
+        stats = summarize([latency for _, latency in recorded], errors=1, elapsed=2.0)
+        self.assertEqual((stats['ops'], stats['errors'], stats['throughput']), (4, 1, 2.0))
+        self.assertAlmostEqual(stats['error_rate'], 0.2)
+        self.assertLessEqual(stats['p50'], stats['p99'])
+
+    def test_cleanup_removes_machines(self):
+        out = io.StringIO()
+        call_command('loadgen', url=self.live_server_url, kiosks=2, duration=0.5, quality_interval=0.1,
+                     sale_interval=0.2, dashboard_interval=0, cleanup=True, stdout=out)
+        self.assertIn('record_quality', out.getvalue())
+        self.assertIn('Removed 2', out.getvalue())
+        self.assertFalse(VendingMachine.objects.filter(machine_id__startswith=LOADGEN_PREFIX).exists())
@@ -20,7 +20,11 @@ urlpatterns = [
     path('api/machines/', views.VendingMachineViewSet.as_view({'get': 'list'})),
     path('api/machines/<int:pk>/', views.VendingMachineViewSet.as_view({'get': 'retrieve'})),
    path('api/machines/<str:machine_id>/quality-history/', 
-         views.VendingMachineViewSet.as_view({'get': 'quality_history'}),
+         views.VendingMachineViewSet.as_view({'get': 'quality_history'},
+                                             renderer_classes=views.TIME_SERIES_RENDERERS),
          name='machine-quality-history'),
+    path('api/machines/<str:machine_id>/sales-history/',
+         views.VendingMachineViewSet.as_view({'get': 'sales_history'}),
+         name='machine-sales-history'),
          
 ]
\ No newline at end of file
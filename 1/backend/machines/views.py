@@ -3,13 +3,38 @@ from django.shortcuts import render
 # Create your views here.
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
 from django.utils import timezone
-from .models import VendingMachine, WaterQuality, SalesRecord
+from core.db import telemetry_commit
+from .models import VendingMachine, WaterQuality, SalesRecord, SalesRollup
+from . import deadband
+from .archive import iter_archived, read_archived
+from .buffer import BufferFull, get_quality_buffer
+from .conditional import make_etag, not_modified, set_validators
+from .downsampling import MIN_POINTS_PER_SERIES, downsample_indices
+from .exports import CONTENT_TYPES, stream_export
+from .ingest import quality_ingested, sale_recorded, save_readings
+from .lookup import forget_machine, resolve_machine
+from .pagination import KeysetPagination
+from .renderers import ColumnarJSONRenderer, MsgPackRenderer
+from .rollups import AUTO_MAX_POINTS, AUTO_OVERSAMPLE, RESOLUTION_STEPS, pick_resolution, truncate
+from .sales_rollups import DEFAULT_SPANS, SALES_RESOLUTIONS, fleet_sales, truncate_local
+from .search import search_machines
+from .summary import get_fleet_summary
 from .serializers import (
     VendingMachineSerializer, 
     WaterQualitySerializer,
-    SalesRecordSerializer
+    WaterQualityReadingSerializer,
+    QualityRollupSerializer,
+    SalesRecordSerializer,
+    SalesRollupSerializer
 )
 
 
@@ -21,26 +46,242 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import VendingMachine
 
+# Batas jumlah baris per request record_quality_batch
+MAX_QUALITY_BATCH = 1000
+
+# max_points minimal: LTTB per series (tds, ph, water) butuh 3 titik masing-masing
+MIN_MAX_POINTS = MIN_POINTS_PER_SERIES * 3
+
+# Renderer endpoint time series; format dipilih lewat Accept atau ?format= (lihat renderers.py)
+TIME_SERIES_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer, MsgPackRenderer]
+
+
+def downsample_qualities(qualities, max_points=None, archived=()):
+    """
+    Ambil qualities sebagai values_list (tanpa membuat object per baris),
+    lalu hanya baris hasil LTTB yang dijadikan WaterQuality untuk di-serialize.
+    archived: baris (id, tds, ph, water, timestamp) dari arsip (archive.read_archived).
+    """
+    rows = list(qualities.values_list('id', 'tds_level', 'ph_level', 'water_level', 'timestamp'))
+    if archived:
+        rows = sorted([*archived, *rows], key=lambda row: (row[4], row[0]))
+    if max_points and len(rows) > max_points:
+        ids, tds, ph, water, timestamps = zip(*rows)
+        keep = downsample_indices([ts.timestamp() for ts in timestamps], [tds, ph, water], max_points)
+        rows = [rows[i] for i in keep]
+    return [archived_instance(row) for row in rows]
+
+
+def archived_instance(row):
+    """WaterQuality (tanpa machine) dari baris (id, tds, ph, water, timestamp)."""
+    pk, tds, ph, water, ts = row
+    return WaterQuality(id=pk, tds_level=tds, ph_level=ph, water_level=water, timestamp=ts)
+
+
+def enqueue_quality(machine, data):
+    """Mode write-behind: reading masuk buffer, disimpan oleh flusher (lihat buffer.py)."""
+    # Timestamp diambil saat diterima, bukan saat di-flush
+    row = {**data, 'timestamp': timezone.now()}
+    try:
+        get_quality_buffer().enqueue(machine.pk, row)
+    except BufferFull:
+        return Response({"error": "Ingest buffer full, retry later"}, status=503,
+                        headers={'Retry-After': '1'})
+    return Response({"status": "accepted", "timestamp": row['timestamp']}, status=202)
+
+
+def find_duplicate(related, client_id):
+    """Baris yang sudah disimpan dengan client_id yang sama (idempotency), atau None."""
+    if not client_id:
+        return None
+    return related.filter(client_id=client_id).first()
+
+
+def machine_gone(machine):
+    """
+    Dipanggil setelah IntegrityError: True kalau machine sudah dihapus (cache lookup
+    proses ini masih menyimpannya), dan entry cache-nya dibuang.
+    """
+    if VendingMachine.objects.filter(pk=machine.pk).exists():
+        return False
+    forget_machine(machine.machine_id)
+    return True
+
+
+def replayed_response(data):
+    # Status sama seperti request pertama; header menandai bahwa tidak ada insert baru
+    return Response(data, headers={'Idempotent-Replayed': 'true'})
+
+
+def parse_date_range(params, default=timedelta(hours=24)):
+    """
+    Ambil start_date/end_date (ISO 8601) dari query params; default `default`
+    terakhir. Tanggal tanpa timezone dianggap timezone aktif. ValueError kalau format salah.
+    """
+    end_date = timezone.now()
+    start_date = end_date - default
+    if 'start_date' in params:
+        start_date = timezone.datetime.fromisoformat(params['start_date'])
+    if 'end_date' in params:
+        end_date = timezone.datetime.fromisoformat(params['end_date'])
+    if timezone.is_naive(start_date):
+        start_date = timezone.make_aware(start_date)
+    if timezone.is_naive(end_date):
+        end_date = timezone.make_aware(end_date)
+    return start_date, end_date
+
+
+def parse_since(value):
+    """
+    Parameter since: timestamp ISO 8601 atau cursor KeysetPagination.
+    Return (timestamp, pk); pk None kalau berupa timestamp. ValueError kalau format salah.
+    """
+    try:
+        since = timezone.datetime.fromisoformat(value)
+        pk = None
+    except ValueError:
+        try:
+            since, pk = KeysetPagination.decode_cursor(value)
+        except ValidationError:
+            raise ValueError(value)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since, pk
+
+
 class VendingMachineViewSet(viewsets.ModelViewSet):
-    queryset = VendingMachine.objects.all()
+    queryset = VendingMachine.objects.order_by('id')
     serializer_class = VendingMachineSerializer
     filterset_fields = ['status', 'location']
     lookup_field = 'machine_id'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Annotation hanya dibutuhkan saat serialize VendingMachineSerializer
+            queryset = queryset.with_dashboard_stats()
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Validator dari max(updated_at) machine & snapshot di hasil filter; total_sales_today
+        # bergantung pada tanggal, jadi tanggal hari ini ikut di ETag
+        stats = self.filter_queryset(VendingMachine.objects.all()).aggregate(
+            machine_updated=Max('updated_at'),
+            snapshot_updated=Max('snapshot__updated_at'),
+            count=Count('id'),
+        )
+        last_modified = max(filter(None, [stats['machine_updated'], stats['snapshot_updated']]), default=None)
+        etag = make_etag('list', request.get_full_path(), timezone.localdate(),
+                         stats['machine_updated'], stats['snapshot_updated'], stats['count'])
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+        return set_validators(super().list(request, *args, **kwargs), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        machine_id = kwargs[self.lookup_field]
+        if 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers:
+            # Cek validator dulu dengan query ringan; 304 tanpa load/serialize machine
+            versions = VendingMachine.objects.filter(
+                machine_id=machine_id
+            ).values_list('updated_at', 'snapshot__updated_at').first()
+            if versions is not None:
+                etag, last_modified = self._retrieve_validators(machine_id, *versions)
+                cached = not_modified(request, etag, last_modified)
+                if cached is not None:
+                    return cached
+        instance = self.get_object()
+        snapshot = instance.get_snapshot()
+        etag, last_modified = self._retrieve_validators(
+            machine_id, instance.updated_at, snapshot.updated_at if snapshot else None
+        )
+        response = Response(self.get_serializer(instance).data)
+        return set_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _retrieve_validators(machine_id, machine_updated, snapshot_updated):
+        # total_sales_today bergantung pada tanggal, jadi tanggal hari ini ikut di ETag
+        etag = make_etag('retrieve', machine_id, timezone.localdate(), machine_updated, snapshot_updated)
+        return etag, max(filter(None, [machine_updated, snapshot_updated]))
+
     @action(detail=True, methods=['post'])
     def record_quality(self, request,  machine_id=None):
         try:
-            machine = VendingMachine.objects.get(machine_id=machine_id)
+            machine = resolve_machine(machine_id)
             serializer = WaterQualitySerializer(data=request.data)
             
             if serializer.is_valid():
-                serializer.save(machine=machine)
+                if settings.QUALITY_INGEST_MODE == 'buffered':
+                    return enqueue_quality(machine, serializer.validated_data)
+
+                client_id = serializer.validated_data.get('client_id')
+                duplicate = find_duplicate(machine.water_qualities, client_id)
+                if duplicate:
+                    return replayed_response(WaterQualitySerializer(duplicate).data)
+                try:
+                    with transaction.atomic():
+                        telemetry_commit()
+                        # Reading yang tidak berubah (deadband machine) tidak disimpan, hanya dihitung
+                        _, suppressed = deadband.filter_readings(machine, [serializer.validated_data])
+                        if suppressed:
+                            snapshot = deadband.readings_suppressed(machine, suppressed)
+                            return Response({"status": "suppressed",
+                                             "suppressed_count": snapshot.suppressed_count})
+                        quality = serializer.save(machine=machine)
+                        quality_ingested(machine, [quality])
+                except IntegrityError:
+                    # Retry kembar yang masuk bersamaan; yang lain sudah menyimpan
+                    duplicate = find_duplicate(machine.water_qualities, client_id)
+                    if duplicate is None:
+                        if machine_gone(machine):
+                            raise VendingMachine.DoesNotExist
+                        raise
+                    return replayed_response(WaterQualitySerializer(duplicate).data)
                 return Response(serializer.data)
             return Response(serializer.errors, status=400)
             
         except VendingMachine.DoesNotExist:
             return Response({"error": "Machine not found"}, status=404)
 
+    @action(detail=True, methods=['post'])
+    def record_quality_batch(self, request, machine_id=None):
+        """
+        Simpan banyak reading sekaligus dengan satu bulk_create.
+        Body: list reading, atau {"readings": [...]}. Setiap reading wajib punya timestamp.
+        Kalau ada baris yang tidak valid tidak ada yang disimpan, dan errors
+        dikembalikan per baris (urutan sama dengan input). Baris dengan client_id
+        yang sudah pernah disimpan dilewati dan dihitung sebagai duplicates; baris
+        yang tertahan deadband dihitung sebagai suppressed.
+        """
+        try:
+            machine = resolve_machine(machine_id)
+        except VendingMachine.DoesNotExist:
+            return Response({"error": "Machine not found"}, status=404)
+
+        readings = request.data
+        if isinstance(readings, dict):
+            readings = readings.get('readings')
+        if not isinstance(readings, list):
+            return Response({"error": "Expected a list of readings"}, status=400)
+        if len(readings) > MAX_QUALITY_BATCH:
+            return Response(
+                {"error": f"Batch too large (max {MAX_QUALITY_BATCH} readings)"},
+                status=400
+            )
+
+        serializer = WaterQualityReadingSerializer(data=readings, many=True)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=400)
+
+        try:
+            created, duplicates, suppressed = save_readings(machine, serializer.validated_data)
+        except IntegrityError:
+            if machine_gone(machine):
+                return Response({"error": "Machine not found"}, status=404)
+            # Batch yang sama sedang disimpan request lain; kiosk cukup kirim ulang
+            return Response({"error": "Concurrent duplicate batch, retry"}, status=409)
+        return Response({"created": created, "duplicates": duplicates, "suppressed": suppressed}, status=201)
+
     # @action(detail=True, methods=['post'])
     # def record_quality(self, request, pk=None):
     #     machine = self.get_object()
@@ -52,39 +293,257 @@ class VendingMachineViewSet(viewsets.ModelViewSet):
     #     return Response(serializer.errors, status=400)
 
     @action(detail=True, methods=['post'])
-    def record_sale(self, request, pk=None):
-        machine = self.get_object()
+    def record_sale(self, request, machine_id=None):
+        try:
+            machine = resolve_machine(machine_id)
+        except VendingMachine.DoesNotExist:
+            raise Http404
+        self.check_object_permissions(request, machine)
         serializer = SalesRecordSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(machine=machine)
+            client_id = serializer.validated_data.get('client_id')
+            duplicate = find_duplicate(machine.sales, client_id)
+            if duplicate:
+                return replayed_response(SalesRecordSerializer(duplicate).data)
+            try:
+                with transaction.atomic():
+                    sale = serializer.save(machine=machine)
+                    sale_recorded(machine, sale)
+            except IntegrityError:
+                duplicate = find_duplicate(machine.sales, client_id)
+                if duplicate is None:
+                    if machine_gone(machine):
+                        raise Http404
+                    raise
+                return replayed_response(SalesRecordSerializer(duplicate).data)
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], renderer_classes=TIME_SERIES_RENDERERS)
     def quality_history(self, request, machine_id=None):
         try:
-            machine = VendingMachine.objects.get(machine_id=machine_id)
-            
-            # Default ambil 24 jam terakhir
-            end_date = timezone.now()
-            start_date = end_date - timedelta(hours=24)
-            
-            # Bisa filter by range
-            if 'start_date' in request.query_params:
-                start_date = timezone.datetime.fromisoformat(request.query_params['start_date'])
-            if 'end_date' in request.query_params:
-                end_date = timezone.datetime.fromisoformat(request.query_params['end_date'])
-            
-            qualities = machine.water_qualities.filter(
-                timestamp__range=(start_date, end_date)
-            ).order_by('timestamp')
-            
-            serializer = WaterQualitySerializer(qualities, many=True)
-            return Response(serializer.data)
+            machine = VendingMachine.objects.select_related('snapshot').get(machine_id=machine_id)
             
+            # Default ambil 24 jam terakhir, bisa filter by range
+            try:
+                start_date, end_date = parse_date_range(request.query_params)
+            except ValueError:
+                return Response({"error": "Invalid start_date/end_date"}, status=400)
+
+            # Data history hanya berubah saat ada ingest (snapshot.updated_at). Tanpa
+            # end_date window ikut bergeser, jadi menit sekarang ikut jadi bagian ETag.
+            snapshot = machine.get_snapshot()
+            version = snapshot.updated_at if snapshot else None
+            window = None if 'end_date' in request.query_params else end_date.replace(second=0, microsecond=0)
+            etag = make_etag('quality_history', request.get_full_path(), request.accepted_media_type,
+                             version, window)
+            cached = not_modified(request, etag)
+            if cached is not None:
+                patch_vary_headers(cached, ['Accept'])
+                return cached
+            response = self._quality_history(request, machine, start_date, end_date)
+            if response.status_code == 200:
+                set_validators(response, etag)
+            # Format (JSON / columnar / msgpack) dipilih dari header Accept
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        except VendingMachine.DoesNotExist:
+            return Response({"error": "Machine not found"}, status=404)
+
+    def _quality_history(self, request, machine, start_date, end_date):
+        # resolution: raw (default), minute, 5min, 15min, hour, day, atau auto
+        resolution = request.query_params.get('resolution', 'raw')
+
+        # since: hanya data setelah titik terakhir yang sudah dimiliki client (refresh delta)
+        since = since_pk = None
+        if 'since' in request.query_params:
+            try:
+                since, since_pk = parse_since(request.query_params['since'])
+            except ValueError:
+                return Response({"error": "Invalid since (expected ISO timestamp or cursor)"}, status=400)
+
+        # max_points: downsampling LTTB di server supaya chart tetap ringan
+        max_points = None
+        if 'max_points' in request.query_params:
+            try:
+                max_points = int(request.query_params['max_points'])
+            except ValueError:
+                max_points = 0
+            if max_points < MIN_MAX_POINTS:
+                return Response({"error": f"max_points must be an integer >= {MIN_MAX_POINTS}"}, status=400)
+
+        if resolution == 'auto':
+            # Bucket terhalus sampai AUTO_OVERSAMPLE x batas titik, sisanya dipangkas LTTB di bawah
+            max_points = max_points or AUTO_MAX_POINTS
+            resolution = pick_resolution(start_date, end_date, AUTO_OVERSAMPLE * max_points)
+
+        if resolution in RESOLUTION_STEPS:
+            rollups = machine.quality_rollups.filter(
+                resolution=resolution,
+                bucket__range=(truncate(start_date, resolution), end_date)
+            ).order_by('bucket')
+            if since:
+                # Bucket yang memuat `since` bisa sudah bertambah isinya, jadi ikut dikirim ulang;
+                # client mengganti titik dengan timestamp >= baris pertama response
+                rollups = rollups.filter(bucket__gte=truncate(since, resolution))
+            if max_points:
+                rollups = list(rollups)
+                keep = downsample_indices(
+                    [rollup.bucket.timestamp() for rollup in rollups],
+                    [[rollup.tds_avg for rollup in rollups],
+                     [rollup.ph_avg for rollup in rollups],
+                     [rollup.water_avg for rollup in rollups]],
+                    max_points
+                )
+                rollups = [rollups[i] for i in keep]
+            serializer = QualityRollupSerializer(rollups, many=True)
+            # Ukuran bucket untuk client, mis. dashboard yang menggabung reading live ke bucket terakhir
+            return Response(serializer.data, headers={'X-Resolution': resolution})
+        if resolution != 'raw':
+            return Response({"error": f"Unknown resolution '{resolution}'"}, status=400)
+
+        qualities = machine.water_qualities.filter(
+            timestamp__range=(start_date, end_date)
+        ).order_by('timestamp')
+        if since_pk is not None:
+            # Cursor: posisi (timestamp, id) persis, aman untuk timestamp kembar. Urutan ikut
+            # (timestamp, id) supaya cocok dengan cursor; sort tambahan hanya untuk baris kembar
+            qualities = qualities.filter(timestamp__gte=since).exclude(
+                timestamp=since, id__lte=since_pk
+            ).order_by('timestamp', 'id')
+        elif since:
+            qualities = qualities.filter(timestamp__gt=since)
+
+        # Keyset pagination kalau client minta cursor/page_size; arsip ikut digabung per halaman
+        if {'cursor', 'page_size'} & set(request.query_params):
+            def archived_after(after):
+                # since tanpa id: semua baris di timestamp since sudah dimiliki client
+                positions = [after, since and (since, since_pk if since_pk is not None else float('inf'))]
+                positions = [position for position in positions if position]
+                rows = iter_archived(machine.pk, start_date, end_date, max(positions) if positions else None)
+                return (archived_instance(row) for row in rows)
+
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(qualities, request, view=self, extra_rows=archived_after)
+            serializer = WaterQualitySerializer(page, many=True)
+            response = paginator.get_paginated_response(serializer.data)
+            response['X-Resolution'] = 'raw'
+            return response
+
+        # Reading yang sudah dipindah ke arsip bulanan (lihat archive.py) ikut digabung
+        archived = read_archived(machine.pk, start_date, end_date)
+        if since_pk is not None:
+            archived = [row for row in archived if (row[4], row[0]) > (since, since_pk)]
+        elif since:
+            archived = [row for row in archived if row[4] > since]
+        if max_points or archived:
+            qualities = downsample_qualities(qualities, max_points, archived)
+
+        serializer = WaterQualitySerializer(qualities, many=True)
+        return Response(serializer.data, headers={'X-Resolution': 'raw'})
+
+
+    @action(detail=True, methods=['get'])
+    def sales_history(self, request, machine_id=None):
+        """SalesRecord urut waktu, keyset pagination (cursor/page_size); start_date/end_date opsional."""
+        try:
+            machine = VendingMachine.objects.get(machine_id=machine_id)
+        except VendingMachine.DoesNotExist:
+            return Response({"error": "Machine not found"}, status=404)
+
+        sales = machine.sales.all()
+        try:
+            if 'start_date' in request.query_params or 'end_date' in request.query_params:
+                start_date, end_date = parse_date_range(request.query_params)
+                sales = sales.filter(timestamp__range=(start_date, end_date))
+        except ValueError:
+            return Response({"error": "Invalid start_date/end_date"}, status=400)
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(sales, request, view=self)
+        serializer = SalesRecordSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def _export(self, request, machine_id, kind):
+        try:
+            machine = VendingMachine.objects.get(machine_id=machine_id)
+        except VendingMachine.DoesNotExist:
+            return Response({"error": "Machine not found"}, status=404)
+        try:
+            start_date, end_date = parse_date_range(request.query_params)
+        except ValueError:
+            return Response({"error": "Invalid start_date/end_date"}, status=400)
+
+        # 'output' (bukan 'format', yang dipakai DRF untuk memilih renderer)
+        output = request.query_params.get('output', 'ndjson')
+        if output not in CONTENT_TYPES:
+            return Response({"error": f"Unknown output '{output}'"}, status=400)
+        gzip = (
+            request.query_params.get('compress') == 'gzip'
+            or 'gzip' in request.headers.get('Accept-Encoding', '')
+        )
+
+        related = machine.water_qualities if kind == 'quality' else machine.sales
+        queryset = related.filter(timestamp__range=(start_date, end_date)).order_by('timestamp', 'id')
+        # Reading yang sudah diarsipkan ikut di-stream, digabung urut (timestamp, id)
+        archived = iter_archived(machine.pk, start_date, end_date) if kind == 'quality' else None
+        filename = f"{machine.machine_id}-{kind}-{start_date:%Y%m%d}-{end_date:%Y%m%d}"
+        return stream_export(queryset, kind, output=output, gzip=gzip, filename=filename, archived=archived)
+
+    @action(detail=True, methods=['get'])
+    def export_quality(self, request, machine_id=None):
+        """Stream WaterQuality untuk range tanggal sebagai NDJSON/CSV (opsional gzip)."""
+        return self._export(request, machine_id, 'quality')
+
+    @action(detail=True, methods=['get'])
+    def export_sales(self, request, machine_id=None):
+        """Stream SalesRecord untuk range tanggal sebagai NDJSON/CSV (opsional gzip)."""
+        return self._export(request, machine_id, 'sales')
+
+    def _sales_analytics_range(self, request):
+        """(resolution, start_date, end_date) dari query params; ValueError kalau tidak valid."""
+        resolution = request.query_params.get('resolution', 'day')
+        if resolution not in SALES_RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}' (hour, day, week)")
+        try:
+            start_date, end_date = parse_date_range(request.query_params, default=DEFAULT_SPANS[resolution])
+        except ValueError:
+            raise ValueError("Invalid start_date/end_date")
+        return resolution, start_date, end_date
+
+    @action(detail=True, methods=['get'])
+    def sales_analytics(self, request, machine_id=None):
+        """Revenue, liter dan jumlah transaksi per jam/hari/minggu (resolution) dari SalesRollup."""
+        try:
+            machine = resolve_machine(machine_id)
         except VendingMachine.DoesNotExist:
             return Response({"error": "Machine not found"}, status=404)
+        try:
+            resolution, start_date, end_date = self._sales_analytics_range(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        rollups = SalesRollup.objects.filter(
+            machine=machine, resolution=resolution,
+            bucket__range=(truncate_local(start_date, resolution), end_date)
+        ).order_by('bucket')
+        return Response(SalesRollupSerializer(rollups, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def fleet_sales_analytics(self, request):
+        """Total fleet: per bucket (series), per machine (urut revenue) dan total range."""
+        try:
+            resolution, start_date, end_date = self._sales_analytics_range(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response({
+            'resolution': resolution,
+            'start_date': start_date,
+            'end_date': end_date,
+            **fleet_sales(resolution, start_date, end_date),
+        })
 
 # class MachineListView(ListView):
 #     model = VendingMachine
@@ -100,7 +559,6 @@ class VendingMachineViewSet(viewsets.ModelViewSet):
     #     return context
 
 # views.py
-from django.db.models import Q
 
 class MachineListView(ListView):
     model = VendingMachine
@@ -109,16 +567,12 @@ class MachineListView(ListView):
     paginate_by = 6  # Menampilkan 12 machines per page
     
     def get_queryset(self):
-        queryset = VendingMachine.objects.all()
+        queryset = VendingMachine.objects.with_dashboard_stats().order_by('id')
         
-        # Search functionality
+        # Search lewat index (FTS5 trigram di SQLite, pg_trgm di PostgreSQL), lihat search.py
         search = self.request.GET.get('search', '')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(location__icontains=search) |
-                Q(machine_id__icontains=search)
-            )
+            queryset = search_machines(queryset, search)
             
         # Filter by status
         status = self.request.GET.get('status', '')
@@ -132,12 +586,13 @@ class MachineListView(ListView):
         # Add extra context
         context['search'] = self.request.GET.get('search', '')
         context['status'] = self.request.GET.get('status', '')
-        context['total_machines'] = VendingMachine.objects.count()
-        context['online_machines'] = VendingMachine.objects.filter(status='online').count()
+        summary = get_fleet_summary()
+        context['fleet_summary'] = summary
+        context['total_machines'] = summary['total']
+        context['online_machines'] = summary['online']
         for machine in context['machines']:
-            # Ambil water quality terbaru untuk setiap machine
-            latest_quality = machine.water_qualities.first()  # Karena sudah di-order by -timestamp
-            machine.latest_quality = latest_quality
+            # Dari annotation with_dashboard_stats(), tanpa query tambahan
+            machine.latest_quality = machine.get_latest_quality()
         return context
 
 class MachineDetailView(DetailView):
@@ -145,19 +600,19 @@ class MachineDetailView(DetailView):
     template_name = 'machines/machine_detail.html'
     context_object_name = 'machine'
 
+    def get_queryset(self):
+        return VendingMachine.objects.with_dashboard_stats()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        machine = self.get_object()
+        machine = self.object
         
         # Get latest water quality
-        latest_quality = machine.water_qualities.first()
-        machine.latest_quality = latest_quality
+        machine.latest_quality = machine.get_latest_quality()
         
         # Get today's sales
-        today = timezone.now().date()
-        context['total_sales_today'] = machine.sales.filter(
-            timestamp__date=today
-        ).count()
+        _, context['total_sales_today'] = machine.get_sales_today()
+        context['recent_sales'] = machine.sales.all()[:5]
 
         return context
     
@@ -6,6 +6,7 @@ import threading
 import os
 import requests
 import json
+import uuid
 from typing import Optional, Dict
 from dataclasses import dataclass
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, 
@@ -268,9 +269,11 @@ class APIClient:
             bool: True if successful, False otherwise
         """
         endpoint = f"machines/{self.config.api_config.machine_id}/record_quality/"
+        # client_id dibuat sekali per reading, jadi retry di _make_request tidak membuat duplikat
+        payload = {**quality_data, 'client_id': str(uuid.uuid4())}
         
         try:
-            result = self._make_request('POST', endpoint, quality_data)
+            result = self._make_request('POST', endpoint, payload)
             return result is not None
         except Exception as e:
             logger.error(f"Error recording quality data: {e}")
@@ -287,9 +290,10 @@ class APIClient:
             bool: True if successful, False otherwise
         """
         endpoint = f"machines/{self.config.api_config.machine_id}/record_sale/"
+        payload = {**sale_data, 'client_id': str(uuid.uuid4())}
         
         try:
-            result = self._make_request('POST', endpoint, sale_data)
+            result = self._make_request('POST', endpoint, payload)
             return result is not None
         except Exception as e:
             logger.error(f"Error recording sale data: {e}")